@@ -0,0 +1,59 @@
+"""Условные GET-запросы к API без обращения к данным страницы.
+
+ETag строится из версий областей кэша (posts/cache.py), которые сигналы
+увеличивают при любом изменении постов и комментариев, и из адреса
+запроса. Last-Modified - время последнего такого изменения, которое
+хранится рядом с версией: правка и удаление его тоже сдвигают, в
+отличие от самой новой pub_date. Чтобы ответить 304 Not Modified,
+достаточно прочитать кэш.
+"""
+import hashlib
+
+from django.utils.functional import cached_property
+from django.views.decorators.http import condition
+
+from posts.cache import get_changed, get_versions
+
+
+class Resource:
+    """Состояние ресурса API для заголовков ETag и Last-Modified.
+
+    scopes - области кэша, от которых зависит ответ; obj - объект,
+    найденный при построении ресурса, чтобы представление не искало его
+    снова.
+    """
+    def __init__(self, request, scopes, extra=(), obj=None):
+        self.request = request
+        self.scopes = list(scopes)
+        self.extra = extra
+        self.obj = obj
+
+    @cached_property
+    def etag(self):
+        parts = [
+            self.request.get_full_path(),
+            *map(str, get_versions(self.scopes)),
+            *map(str, self.extra),
+        ]
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    @cached_property
+    def last_modified(self):
+        return get_changed(self.scopes)
+
+
+def conditional(build):
+    """Декоратор представления API: build(request, **kwargs) строит
+    Resource, а ответ 304 отдается до вызова самого представления.
+    """
+    def resource(request, *args, **kwargs):
+        if not hasattr(request, 'api_resource'):
+            request.api_resource = build(request, *args, **kwargs)
+        return request.api_resource
+
+    return condition(
+        etag_func=lambda *args, **kwargs: resource(*args, **kwargs).etag,
+        last_modified_func=(
+            lambda *args, **kwargs: resource(*args, **kwargs).last_modified
+        ),
+    )
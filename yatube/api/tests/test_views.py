@@ -0,0 +1,177 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.cache import INDEX_SCOPE, get_version
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='writer')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Кошки', slug='cats', description='-'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            for i in range(12)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Отличный пост'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_endpoints_return_json(self):
+        """Все ресурсы API отдают JSON с данными постов и комментариев."""
+        post = self.posts[0]
+        urls = {
+            reverse('api:index'): 'results',
+            reverse('api:group_posts', args=(self.group.slug,)): 'results',
+            reverse('api:profile_posts', args=(self.author.username,)):
+                'results',
+            reverse('api:post_detail', args=(post.id,)): 'text',
+            reverse('api:post_comments', args=(post.id,)): 'results',
+        }
+        for url, key in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response['Content-Type'],
+                                 'application/json')
+                self.assertIn(key, response.json())
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+        data = self.client.get(
+            reverse('api:post_detail', args=(post.id,))
+        ).json()
+        self.assertEqual(data['author'], 'writer')
+        self.assertEqual(data['group'], 'cats')
+        self.assertEqual(data['comment_count'], 1)
+
+    def test_cursor_pagination(self):
+        """Страницы листаются по ссылке next до конца ленты."""
+        url = reverse('api:index')
+        seen = []
+        while url:
+            data = self.client.get(url).json()
+            seen += [post['id'] for post in data['results']]
+            url = data['next']
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+
+    def test_not_modified_without_queries(self):
+        """Повторный запрос с If-None-Match получает 304 без запросов к БД,
+        а после нового поста - свежие данные.
+        """
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_new_comment_changes_post_etag(self):
+        """Новый комментарий меняет ETag поста и его комментариев."""
+        post = self.posts[1]
+        urls = (reverse('api:post_detail', args=(post.id,)),
+                reverse('api:post_comments', args=(post.id,)))
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        Comment.objects.create(post=post, author=self.reader, text='Ага')
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_new_comment_changes_list_etag(self):
+        """Новый комментарий меняет ETag списков постов: в них есть
+        comment_count.
+        """
+        post = self.posts[-1]
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_posts', args=(self.group.slug,)),
+            reverse('api:profile_posts', args=(self.author.username,)),
+            reverse('api:follow_index'),
+        )
+        etags = [self.reader_client.get(url)['ETag'] for url in urls]
+        Comment.objects.create(post_id=post.id, author=self.reader,
+                               text='Ага')
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                counts = {item['id']: item['comment_count']
+                          for item in response.json()['results']}
+                self.assertEqual(counts[post.id], 1)
+
+    def test_comment_keeps_html_pages_cached(self):
+        """Комментарий не сбрасывает кэш HTML-страниц со списками: в них
+        нет числа комментариев.
+        """
+        version = get_version(INDEX_SCOPE)
+        Comment.objects.create(post=self.posts[0], author=self.reader,
+                               text='Не трогает главную')
+        self.assertEqual(get_version(INDEX_SCOPE), version)
+
+    def test_last_modified_follows_edits_and_deletions(self):
+        """Правка и удаление поста сдвигают Last-Modified, и запрос
+        только с If-Modified-Since получает свежие данные.
+        """
+        post = self.posts[-1]
+        urls = (reverse('api:post_detail', args=(post.id,)),
+                reverse('api:index'))
+        dates = [self.client.get(url)['Last-Modified'] for url in urls]
+        later = time.time() + 5
+        with mock.patch('posts.cache.time.time', return_value=later):
+            post.text = 'Исправленный пост'
+            post.save()
+        response = self.client.get(urls[0], HTTP_IF_MODIFIED_SINCE=dates[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['text'], 'Исправленный пост')
+        dates[1] = self.client.get(urls[1])['Last-Modified']
+        with mock.patch('posts.cache.time.time', return_value=later + 5):
+            Post.objects.get(pk=self.posts[0].pk).delete()
+        response = self.client.get(urls[1], HTTP_IF_MODIFIED_SINCE=dates[1])
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_feed(self):
+        """Лента подписок доступна только авторизованным и меняет ETag
+        при отписке.
+        """
+        url = reverse('api:follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.reader_client.get(url)
+        self.assertEqual(len(response.json()['results']), 10)
+        etag = response['ETag']
+        Follow.objects.filter(user=self.reader).delete()
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_missing_objects(self):
+        """Несуществующие пост, группа и автор дают 404."""
+        urls = (
+            reverse('api:post_detail', args=(10 ** 6,)),
+            reverse('api:post_comments', args=(10 ** 6,)),
+            reverse('api:group_posts', args=('no-such-group',)),
+            reverse('api:profile_posts', args=('nobody',)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,174 @@
+from django.conf import settings as s
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from core.paginators import CursorPaginator
+from core.queries import query_budget
+from posts.cache import (INDEX_SCOPE, author_scope, comments_scope,
+                         group_scope, post_scope)
+from posts.models import Follow, Group, Post
+from posts.utils import comments_page
+
+from .conditional import Resource, conditional
+
+User = get_user_model()
+
+# Компактный JSON: без пробелов и с кириллицей как есть
+JSON_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def post_data(post):
+    return {
+        'id': post.id,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'comment_count': post.comment_count,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.id,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+        'author': comment.author.username,
+    }
+
+
+def page_data(request, page, serialize):
+    def link(cursor):
+        if cursor is None:
+            return None
+        query = request.GET.copy()
+        query['cursor'] = cursor
+        return request.build_absolute_uri(f'?{query.urlencode()}')
+
+    return {
+        'results': [serialize(obj) for obj in page],
+        'next': link(page.next_cursor),
+        'previous': link(page.previous_cursor),
+    }
+
+
+def posts_response(request, post_list):
+    paginator = CursorPaginator(post_list, s.POSTS_PER_PAGE)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return json_response(page_data(request, page, post_data))
+
+
+def listing_scopes(*scopes):
+    """Области списка постов вместе с областями их comment_count."""
+    return [*scopes, *map(comments_scope, scopes)]
+
+
+def api_login_required(view):
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return json_response(
+                {'detail': 'Нужна авторизация.'}, status=401
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def index_resource(request):
+    return Resource(request, listing_scopes(INDEX_SCOPE))
+
+
+@query_budget(2)
+@require_safe
+@conditional(index_resource)
+def index(request):
+    return posts_response(request, Post.objects.for_listing())
+
+
+def group_resource(request, slug):
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return Resource(
+        request, listing_scopes(group_scope(group.id)), obj=group,
+    )
+
+
+@query_budget(3)
+@require_safe
+@conditional(group_resource)
+def group_posts(request, slug):
+    group = request.api_resource.obj
+    return posts_response(request, group.group_posts.for_listing())
+
+
+def profile_resource(request, username):
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return Resource(
+        request, listing_scopes(author_scope(author.id)), obj=author,
+    )
+
+
+@query_budget(3)
+@require_safe
+@conditional(profile_resource)
+def profile_posts(request, username):
+    author = request.api_resource.obj
+    return posts_response(
+        request, Post.objects.for_listing().filter(author=author)
+    )
+
+
+def follow_resource(request):
+    # Лента меняется вместе с постами любого из авторов подписки и
+    # с самим списком подписок: оба входят в ETag
+    authors = sorted(Follow.objects.filter(
+        user=request.user
+    ).values_list('author_id', flat=True))
+    return Resource(
+        request, listing_scopes(*map(author_scope, authors)),
+        extra=[request.user.id, *authors],
+    )
+
+
+@query_budget(5)
+@require_safe
+@api_login_required
+@conditional(follow_resource)
+def follow_index(request):
+    posts_list = Post.objects.for_listing().filter(
+        feed_entries__user=request.user
+    )
+    return posts_response(request, posts_list)
+
+
+def post_resource(request, post_id):
+    # Пост здесь не загружается: удаление поста тоже меняет версию
+    # области, поэтому устаревший ETag не совпадет и представление
+    # ответит 404
+    return Resource(request, [post_scope(post_id)])
+
+
+@query_budget(2)
+@require_safe
+@conditional(post_resource)
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_listing(), id=post_id)
+    return json_response(post_data(post))
+
+
+def comments_resource(request, post_id):
+    return Resource(request, [post_scope(post_id)])
+
+
+@query_budget(3)
+@require_safe
+@conditional(comments_resource)
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('id'), id=post_id)
+    page = comments_page(post_id, request.GET.get('cursor'))
+    return json_response(page_data(request, page, comment_data))
@@ -0,0 +1,289 @@
+"""Бэкенды кэша для нескольких воркеров gunicorn.
+
+RedisCache хранит данные на общем сервере с протоколом Redis,
+поэтому инвалидация версий (posts/cache.py) видна всем воркерам.
+TwoTierCache ставит перед общим кэшем небольшой LRU в памяти процесса:
+горячие ключи читаются без сетевого запроса, а устаревание локальной
+копии ограничено параметром LOCAL_TIMEOUT.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .resp import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# INCRBY только для существующего ключа, одной операцией на сервере.
+# Между отдельными EXISTS и INCRBY ключ мог истечь, и INCRBY создал бы
+# его заново со значением delta и без срока жизни
+INCR_EXISTING = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1]) end"
+)
+
+
+def _get_pool(location, options):
+    with _pools_lock:
+        if location not in _pools:
+            _pools[location] = ConnectionPool(
+                location,
+                max_connections=options.get('MAX_CONNECTIONS', 10),
+                timeout=options.get('SOCKET_TIMEOUT', 1.0),
+            )
+        return _pools[location]
+
+
+class RedisCache(BaseCache):
+    """Кэш на сервере с протоколом Redis.
+
+    Целые числа хранятся как есть, чтобы incr() выполнялся на сервере
+    атомарно (скрипт INCR_EXISTING); остальные значения сериализуются
+    pickle.
+    """
+    def __init__(self, server, params):
+        super().__init__(params)
+        self._options = params.get('OPTIONS', {})
+        self._pool = _get_pool(server, self._options)
+
+    def _encode(self, value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return b'%d' % value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _decode(self, data):
+        if data is None or data[:1] == b'\x80':
+            return None if data is None else pickle.loads(data)
+        return int(data)
+
+    def _expiry_args(self, timeout):
+        """Аргументы SET для срока жизни: () - хранить без срока."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return ()
+        # timeout <= 0 в Django означает «сразу устарело»
+        return ('PX', max(int(timeout * 1000), 1))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        reply = self._pool.execute(
+            'SET', key, self._encode(value), 'NX',
+            *self._expiry_args(timeout)
+        )
+        return reply is not None
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = self._pool.execute('GET', key)
+        return default if data is None else self._decode(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._pool.execute(
+            'SET', key, self._encode(value), *self._expiry_args(timeout)
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        expiry = self._expiry_args(timeout)
+        if expiry:
+            return bool(self._pool.execute('PEXPIRE', key, expiry[1]))
+        self._pool.execute('PERSIST', key)
+        return bool(self._pool.execute('EXISTS', key))
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._pool.execute('DEL', key)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        made = [self.make_key(key, version=version) for key in keys]
+        values = self._pool.execute('MGET', *made)
+        found = {
+            key: self._decode(data)
+            for key, data in zip(keys, values) if data is not None
+        }
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expiry = self._expiry_args(timeout)
+        commands = [
+            ('SET', self.make_key(key, version=version),
+             self._encode(value), *expiry)
+            for key, value in data.items()
+        ]
+        if commands:
+            self._pool.pipeline(commands)
+        return []
+
+    def delete_many(self, keys, version=None):
+        made = [self.make_key(key, version=version) for key in keys]
+        if made:
+            self._pool.execute('DEL', *made)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        return bool(self._pool.execute('EXISTS', key))
+
+    def incr(self, key, delta=1, version=None):
+        made = self.make_key(key, version=version)
+        value = self._pool.execute('EVAL', INCR_EXISTING, 1, made, delta)
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def clear(self):
+        self._pool.execute('FLUSHDB')
+
+    def close(self, **kwargs):
+        # Соединения живут в пуле процесса и переиспользуются запросами
+        pass
+
+
+class LocalLRU:
+    """Ограниченный по размеру словарь с вытеснением давно не читанных
+    ключей и сроком жизни записей."""
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def discard(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local_tiers = {}
+
+
+class TwoTierCache(BaseCache):
+    """LRU в памяти процесса перед общим кэшем.
+
+    LOCATION - алиас общего кэша из settings.CACHES. Записи и incr()
+    всегда идут в общий кэш, чтение сначала смотрит в локальный LRU.
+    """
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = server
+        # Локальный уровень общий для всех потоков процесса
+        tier = (
+            settings.CACHES[server].get('LOCATION', server),
+            options.get('LOCAL_MAX_ENTRIES', 1000),
+            options.get('LOCAL_TIMEOUT', 2),
+        )
+        self.local = _local_tiers.setdefault(tier, LocalLRU(*tier[1:]))
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self.local.set(self.make_key(key, version), value)
+        return added
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version)
+        item = self.local.get(local_key)
+        if item is not None:
+            return item[1]
+        value = self.shared.get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        self.local.set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found, missing = {}, []
+        for key in keys:
+            item = self.local.get(self.make_key(key, version))
+            if item is None:
+                missing.append(key)
+            else:
+                found[key] = item[1]
+        if missing:
+            fetched = self.shared.get_many(missing, version)
+            for key, value in fetched.items():
+                self.local.set(self.make_key(key, version), value)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self.local.set(self.make_key(key, version), value)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            self.local.set(self.make_key(key, version), value)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version)
+        self.local.discard(self.make_key(key, version))
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version)
+        self.local.discard(*(self.make_key(key, version) for key in keys))
+
+    def has_key(self, key, version=None):
+        if self.local.get(self.make_key(key, version)) is not None:
+            return True
+        return self.shared.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        self.local.discard(self.make_key(key, version))
+        return value
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+
+
+_MISSING = object()
@@ -0,0 +1,126 @@
+"""Минимальный клиент протокола Redis (RESP) с пулом соединений.
+
+Нужен, чтобы общий кэш работал без сторонних библиотек: мы используем
+только несколько команд (GET/SET/DEL/MGET/INCRBY/EXISTS/...),
+которые поддерживают и Redis, и совместимые с ним серверы.
+"""
+import queue
+import socket
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    """Сервер вернул ошибку в ответ на команду."""
+
+
+def encode_command(*args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = b'%d' % arg
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError('Соединение с сервером кэша закрыто')
+    kind, payload = line[:1], line[1:-2]
+    if kind == b'+':
+        return payload.decode()
+    if kind == b'-':
+        raise RespError(payload.decode())
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length == -1:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        length = int(payload)
+        if length == -1:
+            return None
+        return [read_reply(stream) for _ in range(length)]
+    raise RespError(f'Неизвестный тип ответа: {line!r}')
+
+
+class Connection:
+    def __init__(self, host, port, db=0, timeout=None):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile('rb')
+        if db:
+            self.execute('SELECT', db)
+
+    def execute(self, *args):
+        self.sock.sendall(encode_command(*args))
+        return read_reply(self.stream)
+
+    def pipeline(self, commands):
+        """Отправляет пачку команд одним пакетом и читает все ответы."""
+        self.sock.sendall(b''.join(
+            encode_command(*args) for args in commands
+        ))
+        return [read_reply(self.stream) for _ in commands]
+
+    def close(self):
+        try:
+            self.stream.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений к одному серверу.
+
+    Соединение, на котором случилась сетевая ошибка, в пул
+    не возвращается: следующий запрос откроет новое.
+    """
+    def __init__(self, url, max_connections=10, timeout=None):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = Connection(self.host, self.port, self.db, self.timeout)
+            try:
+                yield conn
+            except (OSError, ConnectionError):
+                conn.close()
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def execute(self, *args):
+        with self.connection() as conn:
+            return conn.execute(*args)
+
+    def pipeline(self, commands):
+        with self.connection() as conn:
+            return conn.pipeline(commands)
+
+    def disconnect(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,25 @@
+"""Настройка соединений с SQLite.
+
+Django открывает SQLite с настройками по умолчанию: журнал отката
+(читатели ждут писателя), кэш страниц 2 МБ, без mmap. Обработчик
+сигнала connection_created выполняет PRAGMA из settings.SQLITE_PRAGMAS
+для каждого нового соединения; в продакшене это
+settings.SQLITE_PRODUCTION_PRAGMAS.
+"""
+from django.conf import settings
+
+
+def apply_pragmas(connection, pragmas):
+    """Выполняет PRAGMA на соединении sqlite3 из стандартной библиотеки."""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created.
+
+    PRAGMA идут мимо курсора Django, чтобы не попадать в счетчики
+    запросов (core/middleware.py) и бюджеты вьюх.
+    """
+    if connection.vendor == 'sqlite' and settings.SQLITE_PRAGMAS:
+        apply_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
@@ -0,0 +1,143 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'text TEXT, pub_date TEXT)',
+    'CREATE INDEX post_pub_date ON post (pub_date)',
+)
+READ = 'SELECT id, author_id, text FROM post ORDER BY pub_date DESC ' \
+       'LIMIT 10 OFFSET ?'
+WRITE = "INSERT INTO post (author_id, text, pub_date) " \
+        "VALUES (?, ?, datetime('now'))"
+
+
+class Profile:
+    """Как приложение работает с базой: какие PRAGMA и переиспользуется
+    ли соединение между запросами (CONN_MAX_AGE).
+    """
+    def __init__(self, name, pragmas, persistent):
+        self.name = name
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.local = threading.local()
+
+    def connect(self, path):
+        connection = sqlite3.connect(path, isolation_level=None)
+        apply_pragmas(connection, self.pragmas)
+        return connection
+
+    def run(self, path, statement, params):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.connect(path)
+        try:
+            connection.execute(statement, params).fetchall()
+        finally:
+            if self.persistent:
+                self.local.connection = connection
+            else:
+                connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite на чтение и запись с '
+        'настройками по умолчанию и с профилем продакшена '
+        '(SQLITE_PRODUCTION_PRAGMAS и постоянные соединения).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        profiles = (
+            Profile('default', {}, persistent=False),
+            Profile('production', settings.SQLITE_PRODUCTION_PRAGMAS,
+                    persistent=True),
+        )
+        self.stdout.write(
+            f'{"профиль":<12}{"чтений/с":>10}{"записей/с":>11}'
+            f'{"p95 чт., мс":>13}{"p95 зап., мс":>14}{"locked":>8}'
+        )
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.populate(profile, path, options['rows'])
+                result = self.measure(profile, path, options)
+            self.stdout.write(
+                f'{profile.name:<12}{result["reads"]:>10.0f}'
+                f'{result["writes"]:>11.0f}{result["read_p95"]:>13.2f}'
+                f'{result["write_p95"]:>14.2f}{result["locked"]:>8}'
+            )
+
+    def populate(self, profile, path, rows):
+        connection = profile.connect(path)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.execute('BEGIN')
+        connection.executemany(
+            "INSERT INTO post (author_id, text, pub_date) VALUES "
+            "(?, ?, datetime('now', ?))",
+            ((i % 100, 'текст поста ' * 20, f'-{i} seconds')
+             for i in range(rows)),
+        )
+        connection.execute('COMMIT')
+        connection.close()
+
+    def measure(self, profile, path, options):
+        deadline = time.perf_counter() + options['seconds']
+        timings = {'read': [], 'write': []}
+        locked = []
+        pages = max(options['rows'] // 10 - 1, 1)
+
+        def worker(kind):
+            statement = READ if kind == 'read' else WRITE
+            while time.perf_counter() < deadline:
+                params = ((random.randrange(pages) * 10,) if kind == 'read'
+                          else (1, 'новый комментарий'))
+                started = time.perf_counter()
+                try:
+                    profile.run(path, statement, params)
+                except sqlite3.OperationalError:
+                    locked.append(kind)
+                    continue
+                timings[kind].append(time.perf_counter() - started)
+
+        threads = [
+            threading.Thread(target=worker, args=('read',))
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(target=worker, args=('write',))
+            for _ in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {
+            'reads': len(timings['read']) / options['seconds'],
+            'writes': len(timings['write']) / options['seconds'],
+            'read_p95': self.p95(timings['read']),
+            'write_p95': self.p95(timings['write']),
+            'locked': len(locked),
+        }
+
+    @staticmethod
+    def p95(values):
+        if len(values) < 2:
+            return 0.0
+        return statistics.quantiles(values, n=20)[-1] * 1000
@@ -0,0 +1,228 @@
+"""Замеры производительности запросов.
+
+PerformanceMiddleware для доли запросов PERF_SAMPLE_RATE считает
+время ответа, число и суммарное время SQL-запросов (через
+connection.execute_wrapper), время рендера шаблонов и попадания в кэш.
+Итог уходит в заголовок Server-Timing (виден во вкладке Network
+браузера) и строкой JSON в логгер yatube.performance. Время шаблонов,
+общее и каждого по отдельности, сообщают загрузчики из
+core/template_loaders.py. Запросы вне выборки проходят без обвязки,
+поэтому middleware можно держать включенным в продакшене. Поиск N+1 по
+собранным запросам описан в core/queries.py.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from . import routers
+from .queries import QueryLog, QueryProblem
+
+logger = logging.getLogger('yatube.performance')
+
+_current = threading.local()
+_MISSING = object()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.log = QueryLog()
+        self.sql = 0.0
+        # Время внешних рендеров: вложенные шаблоны уже входят в него
+        self.templates = 0.0
+        self.template_depth = 0
+        # имя шаблона -> [число рендеров, секунды]
+        self.template_times = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache = 0.0
+
+    @property
+    def queries(self):
+        return len(self.log)
+
+    def add_template(self, name, seconds):
+        timing = self.template_times.setdefault(name, [0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ', '.join((
+            f'total;dur={self.total * 1000:.1f}',
+            f'db;dur={self.sql * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.templates * 1000:.1f}',
+            f'cache;dur={self.cache * 1000:.1f};'
+            f'desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+        ))
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total * 1000, 2),
+            'queries': self.queries,
+            'sql_ms': round(self.sql * 1000, 2),
+            'template_ms': round(self.templates * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_ms': round(self.cache * 1000, 2),
+            'templates': {
+                name: {'calls': calls, 'ms': round(seconds * 1000, 2)}
+                for name, (calls, seconds) in sorted(
+                    self.template_times.items(), key=lambda item: -item[1][1]
+                )
+            },
+        }
+
+
+def current_metrics():
+    """Метрики текущего запроса или None, если он не попал в выборку."""
+    return getattr(_current, 'metrics', None)
+
+
+def _count_queries(metrics):
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - started
+            metrics.sql += seconds
+            metrics.log.record(sql, seconds)
+    return wrapper
+
+
+def _instrument_cache(stack, metrics, backend):
+    """Подменяет get/get_many у кэша текущего потока до конца запроса.
+
+    Объекты caches[alias] свои у каждого потока, поэтому подмена
+    атрибутов экземпляра не видна параллельным запросам.
+    """
+    get, get_many = backend.get, backend.get_many
+    # BaseCache.get_many сам вызывает get для каждого ключа: такие
+    # вложенные обращения уже учтены внешним get_many
+    nested = []
+
+    def timed_get(key, default=None, version=None):
+        if nested:
+            return get(key, default, version=version)
+        started = time.perf_counter()
+        value = get(key, _MISSING, version=version)
+        metrics.cache += time.perf_counter() - started
+        if value is _MISSING:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+
+    def timed_get_many(keys, version=None):
+        keys = list(keys)
+        nested.append(True)
+        started = time.perf_counter()
+        try:
+            found = get_many(keys, version=version)
+        finally:
+            nested.pop()
+        metrics.cache += time.perf_counter() - started
+        metrics.cache_hits += len(found)
+        metrics.cache_misses += len(keys) - len(found)
+        return found
+
+    backend.get, backend.get_many = timed_get, timed_get_many
+
+    def restore():
+        del backend.get, backend.get_many
+    stack.callback(restore)
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # В строгом режиме замеряется каждый запрос, но в лог попадает
+        # только выборка
+        sampled = random.random() < settings.PERF_SAMPLE_RATE
+        if not sampled and not settings.QUERY_STRICT:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(_count_queries(metrics))
+                )
+            for alias in settings.PERF_CACHE_ALIASES:
+                _instrument_cache(stack, metrics, caches[alias])
+            _current.metrics = metrics
+            stack.callback(delattr, _current, 'metrics')
+            response = self.get_response(request)
+        metrics.finish()
+        response['Server-Timing'] = metrics.server_timing()
+        match = request.resolver_match
+        view = match.view_name if match else None
+        if sampled:
+            self.log(request, view, response, metrics)
+        self.check_queries(request, view, metrics)
+        return response
+
+    def log(self, request, view, response, metrics):
+        logger.info(json.dumps(dict(
+            method=request.method,
+            path=request.path,
+            view=view,
+            status=response.status_code,
+            **metrics.as_dict(),
+        ), ensure_ascii=False))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
+
+    def check_queries(self, request, view, metrics):
+        for sql, seconds, location in metrics.log.slow(
+            settings.SLOW_QUERY_MS / 1000
+        ):
+            logger.warning('%s: медленный запрос %.0f мс из %s: %s',
+                           view, seconds * 1000, location, sql)
+        problems = metrics.log.problems(
+            getattr(request, 'query_budget', None)
+        )
+        if not problems:
+            return
+        if settings.QUERY_STRICT:
+            raise QueryProblem(f'{request.method} {request.path}: '
+                               + '; '.join(problems))
+        for problem in problems:
+            logger.warning('%s: %s', view, problem)
+
+
+class ReplicaStickinessMiddleware:
+    """Читает с основной базы после записи (см. core/routers.py)."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REPLICA_ALIAS:
+            return self.get_response(request)
+        routers.start_request(
+            pinned=settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request()
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,310 @@
+"""Постраничная разбивка без лишних COUNT(*) и OFFSET.
+
+CursorPaginator листает упорядоченный queryset по ключу сортировки
+(по умолчанию (pub_date, id)): следующая страница выбирается условием
+«строго после последней строки», поэтому глубина страницы не влияет на
+стоимость запроса, а общее число строк не считается вовсе.
+
+WindowedPaginator - обычная нумерация страниц, в которой вместо полного
+списка номеров показывается окно: первая и последняя страницы и
+несколько соседних с текущей. Общее число строк можно передать готовым
+(например, из денормализованного счетчика) или оценить по статистике
+SQLite; наличие следующей страницы при этом проверяется точно.
+"""
+import base64
+import json
+from collections.abc import Sequence
+
+from django.core.paginator import (
+    EmptyPage, Page, PageNotAnInteger, Paginator
+)
+from django.db import DatabaseError, connections
+from django.db.models import Q
+
+
+class CursorPage(Page):
+    """Страница, совместимая с django.core.paginator.Page по интерфейсу
+    для шаблонов, но без номера страницы и общего количества.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self.object_list)} objects>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator:
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self._fields = [
+            object_list.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+
+    def encode_cursor(self, direction, obj):
+        values = [
+            field.value_to_string(obj) for field in self._fields
+        ]
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, значения ключа) или None,
+        если курсор пустой или испорчен.
+        """
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+            if direction not in ('n', 'p') or (
+                len(values) != len(self._fields)
+            ):
+                return None
+            values = [
+                field.to_python(value)
+                for field, value in zip(self._fields, values)
+            ]
+        except (ValueError, TypeError):
+            return None
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Условие «строка лежит после (или до) ключа values»
+        в порядке сортировки self.ordering.
+        """
+        condition = Q()
+        equal = Q()
+        for name, value in zip(self.ordering, values):
+            descending = name.startswith('-')
+            field = name.lstrip('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor)
+        queryset = self.object_list.order_by(*self.ordering)
+        limit = self.per_page + 1
+        if decoded is None:
+            rows = list(queryset[:limit])
+            has_more, has_less = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        elif decoded[0] == 'n':
+            rows = list(queryset.filter(self._seek(decoded[1], True))[:limit])
+            has_more, has_less = len(rows) > self.per_page, True
+            rows = rows[:self.per_page]
+        else:
+            reverse = queryset.reverse().filter(
+                self._seek(decoded[1], False)
+            )
+            rows = list(reverse[:limit])
+            has_more, has_less = True, len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+        next_cursor = previous_cursor = None
+        if rows and has_more:
+            next_cursor = self.encode_cursor('n', rows[-1])
+        if rows and has_less:
+            previous_cursor = self.encode_cursor('p', rows[0])
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+def page_window(number, num_pages, on_each_side=2, on_ends=1):
+    """Номера страниц для навигации: on_ends первых и последних и по
+    on_each_side с каждой стороны от текущей. На месте пропуска - None.
+
+    >>> list(page_window(10, 20))
+    [1, None, 8, 9, 10, 11, 12, None, 20]
+    """
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        yield from range(1, num_pages + 1)
+        return
+    left = max(number - on_each_side, 1)
+    right = min(number + on_each_side, num_pages)
+    if left > on_ends + 2:
+        yield from range(1, on_ends + 1)
+        yield None
+    else:
+        left = 1
+    if right < num_pages - on_ends - 1:
+        yield from range(left, right + 1)
+        yield None
+        yield from range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        yield from range(left, num_pages + 1)
+
+
+def estimate_count(queryset):
+    """Число строк таблицы из статистики SQLite без COUNT(*).
+
+    sqlite_stat1 заполняют ANALYZE и PRAGMA optimize; первое число в
+    столбце stat - число строк в таблице. Оценка годится только для
+    queryset без фильтров, иначе и если статистики нет - None.
+    """
+    query = getattr(queryset, 'query', None)
+    if query is None or query.where or query.distinct or (
+        query.low_mark or query.high_mark is not None
+    ):
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != 'sqlite':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+    except DatabaseError:
+        # Таблица sqlite_stat1 появляется после первого ANALYZE
+        return None
+    return int(row[0].split()[0]) if row else None
+
+
+class PageRows(Sequence):
+    """Строки страницы WindowedPaginator, выбираемые при первом обращении.
+
+    Страница целиком рисуется внутри {% cache %}: пока фрагмент берется
+    из кэша, строки не нужны, и запроса к БД не будет. Выборка уточняет
+    число строк пагинатора, а если страница оказалась пустой (счетчик
+    устарел), вместо нее выбирается последняя и меняется номер страницы.
+    """
+    def __init__(self, paginator, number):
+        self.paginator = paginator
+        self.number = number
+        self.page = None
+        self._rows = None
+
+    def load(self):
+        if self._rows is None:
+            paginator = self.paginator
+            paginator._pending = None
+            try:
+                self._rows = paginator.fetch(self.number)
+            except EmptyPage:
+                paginator._set_count(paginator.exact_count(), False)
+                self.number = paginator.num_pages
+                self._rows = paginator.fetch(self.number)
+                if self.page is not None:
+                    self.page.number = self.number
+        return self._rows
+
+    def __len__(self):
+        return len(self.load())
+
+    def __getitem__(self, index):
+        return self.load()[index]
+
+    def __iter__(self):
+        return iter(self.load())
+
+
+class WindowedPaginator(Paginator):
+    """Paginator, которому не обязательно считать COUNT(*).
+
+    count - готовое (возможно, устаревшее) число строк, estimate -
+    оценить его по статистике SQLite. Страница выбирается с одной лишней
+    строкой, и по ней число строк уточняется так, чтобы «Следующая» была
+    верна: на последней странице оно становится точным, а за концом
+    списка пересчитывается честным COUNT(*).
+
+    get_page() откладывает выборку до первого обращения к строкам
+    страницы, к count или num_pages (см. PageRows); номер страницы
+    за концом устаревшего счетчика верен после этого обращения.
+    """
+    def __init__(self, object_list, per_page, count=None, estimate=False):
+        super().__init__(object_list, per_page)
+        self.estimated = False
+        self._known_count = count
+        self._estimate = estimate
+        self._count = None
+        self._pending = None
+
+    @property
+    def count(self):
+        if self._pending is not None:
+            self._pending.load()
+        if self._count is None:
+            self._count = self._initial_count()
+        return self._count
+
+    @property
+    def num_pages(self):
+        return Paginator.num_pages.func(self)
+
+    def _initial_count(self):
+        count = self._known_count
+        if count is None and self._estimate:
+            count = estimate_count(self.object_list)
+        if count is None:
+            return self.exact_count()
+        self.estimated = True
+        return count
+
+    def exact_count(self):
+        return Paginator.count.func(self)
+
+    def _set_count(self, count, estimated):
+        self._count, self.estimated = count, estimated
+        self.__dict__.pop('page_range', None)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            number = int(number)
+            if number < 1 or not self.estimated:
+                raise
+            # Оценка могла занизить число страниц: есть ли страница
+            # на самом деле, покажет выборка в page()
+            return number
+
+    def fetch(self, number):
+        """Строки страницы number; число строк уточняется по выборке."""
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not rows and number > 1:
+            if self.estimated:
+                # Оценка завысила число строк: считаем точно
+                self._set_count(self.exact_count(), False)
+            raise EmptyPage('That page contains no results')
+        if not has_more:
+            self._set_count(bottom + len(rows), False)
+        elif self.estimated:
+            self._set_count(
+                max(self.count, bottom + len(rows) + 1), True
+            )
+        return rows
+
+    def page(self, number):
+        number = self.validate_number(number)
+        return self._get_page(self.fetch(number), number, self)
+
+    def get_page(self, number):
+        try:
+            number = self.validate_number(number)
+        except PageNotAnInteger:
+            number = 1
+        except EmptyPage:
+            return self.page(self.num_pages)
+        rows = PageRows(self, number)
+        rows.page = self._get_page(rows, number, self)
+        self._pending = rows
+        return rows.page
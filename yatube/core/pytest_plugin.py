@@ -0,0 +1,7 @@
+"""Плагин pytest: тесты идут с QUERY_STRICT, как и в StrictQueryRunner."""
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def strict_queries(settings):
+    settings.QUERY_STRICT = True
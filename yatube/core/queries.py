@@ -0,0 +1,151 @@
+"""Поиск N+1 и медленных SQL-запросов.
+
+QueryLog запоминает запросы, выполненные за время HTTP-запроса, вместе
+с местом в коде, откуда они пришли, и группирует их по форме: SQL без
+литералов и с IN (...) вместо списка параметров. Одна и та же форма,
+повторенная QUERY_REPEAT_THRESHOLD и более раз, почти всегда означает
+цикл с запросом на каждой итерации (N+1). Вьюха может объявить
+допустимое число запросов декоратором query_budget, а разовую работу
+внутри запроса можно исключить из проверок блоком exempt().
+
+Проверки выполняет PerformanceMiddleware (core/middleware.py): в обычном
+режиме находки пишутся в лог, а при QUERY_STRICT - например, в тестах -
+запрос падает с QueryProblem.
+"""
+import os
+import re
+import sys
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)')
+_SPACES = re.compile(r'\s+')
+# Кадры стека из этих модулей не интересны как источник запроса
+_SKIP_FILES = (__file__, os.path.join('core', 'middleware.py'))
+
+_local = threading.local()
+
+
+class QueryProblem(Exception):
+    """Запрос превысил бюджет или повторяет одну форму SQL слишком часто."""
+
+
+def query_budget(limit):
+    """Объявляет, сколько SQL-запросов может сделать вьюха."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+@contextmanager
+def exempt():
+    """Запросы внутри блока не проверяются на N+1 и не входят в бюджет.
+
+    Для разовой работы, которая иногда выполняется прямо в запросе:
+    ленивый пересчет счетчиков, создание миниатюр без пула процессов.
+    """
+    _local.allowed = getattr(_local, 'allowed', 0) + 1
+    try:
+        yield
+    finally:
+        _local.allowed -= 1
+
+
+def shape(sql):
+    """Форма запроса: SQL без литералов и длины списков в IN."""
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _LISTS.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def _template_line(frame):
+    node = frame.f_locals.get('self')
+    origin = getattr(node, 'origin', None)
+    token = getattr(node, 'token', None)
+    if origin is None or token is None:
+        return None
+    return f'{origin.template_name}:{token.lineno}'
+
+
+def caller():
+    """Место в коде проекта, откуда пришел запрос.
+
+    Если запрос выполнился при рендере шаблона, к строке кода
+    добавляется строка шаблона - там обычно и прячется N+1.
+    """
+    location = template = None
+    frame = sys._getframe(1)
+    while frame is not None and template is None:
+        filename = frame.f_code.co_filename
+        if frame.f_code.co_name == 'render_annotated':
+            template = _template_line(frame)
+        elif location is None and filename.startswith(
+            settings.BASE_DIR
+        ) and not filename.endswith(_SKIP_FILES):
+            location = (f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                        f'{frame.f_lineno}')
+        frame = frame.f_back
+    if location and template:
+        return f'{location} ({template})'
+    return location or template or '?'
+
+
+class QueryLog:
+    def __init__(self):
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def record(self, sql, seconds):
+        self.queries.append((
+            shape(sql), seconds, caller(),
+            bool(getattr(_local, 'allowed', 0)),
+        ))
+
+    def budgeted(self):
+        """Сколько запросов считается в бюджет вьюхи."""
+        return sum(1 for *_, exempted in self.queries if not exempted)
+
+    def repeated(self, threshold):
+        """Формы, встретившиеся threshold и более раз:
+        [(форма, сколько раз, места в коде)].
+        """
+        groups = defaultdict(list)
+        for sql, _, location, exempted in self.queries:
+            if not exempted:
+                groups[sql].append(location)
+        return [
+            (sql, len(locations), sorted(set(locations)))
+            for sql, locations in groups.items()
+            if len(locations) >= threshold
+        ]
+
+    def slow(self, seconds):
+        return [
+            (sql, duration, location)
+            for sql, duration, location, _ in self.queries
+            if duration >= seconds
+        ]
+
+    def problems(self, budget=None):
+        """Описания найденных проблем, по строке на каждую."""
+        found = []
+        count = self.budgeted()
+        if budget is not None and count > budget:
+            found.append(f'{count} запросов при бюджете {budget}')
+        for sql, count, locations in self.repeated(
+            settings.QUERY_REPEAT_THRESHOLD
+        ):
+            found.append(
+                f'{count} одинаковых запросов из {", ".join(locations)}: '
+                f'{sql}'
+            )
+        return found
@@ -0,0 +1,60 @@
+"""Чтение с реплики базы данных.
+
+Если задан REPLICA_ALIAS, ReplicaRouter отправляет чтение HTTP-запросов
+на реплику, а запись - в основную базу. Реплика может отставать,
+поэтому с основной базы читают:
+
+* остаток HTTP-запроса после первой записи;
+* следующие запросы того же браузера в течение REPLICA_PIN_SECONDS:
+  ReplicaStickinessMiddleware ставит для этого cookie. Cookie, а не
+  сессия, потому что сохранение сессии само было бы записью в базу;
+* все, что выполняется вне HTTP-запроса: команды, фоновые потоки.
+
+Кэш страниц учитывает, с какой базы они собраны (posts/cache.py).
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+def start_request(pinned=False):
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def end_request():
+    """Возвращает поток к чтению с основной базы; True, если в запросе
+    была запись.
+    """
+    wrote = getattr(_state, 'wrote', False)
+    _state.pinned, _state.wrote = True, False
+    return wrote
+
+
+def read_alias():
+    """База, с которой сейчас читает поток."""
+    return ReplicaRouter().db_for_read(None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = settings.REPLICA_ALIAS
+        if not replica or getattr(_state, 'pinned', True):
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # Явно, а не None: иначе Django запишет объект в базу, из которой
+        # он был прочитан, то есть в реплику
+        _state.wrote = _state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной базы, объекты из них связаны
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != settings.REPLICA_ALIAS
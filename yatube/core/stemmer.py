@@ -0,0 +1,134 @@
+"""Стеммер русского языка по алгоритму Snowball.
+
+Используется поисковым индексом (posts/search.py): слова текста и
+запроса приводятся к одной основе, поэтому «котов», «коты» и «кот»
+находят друг друга. Описание алгоритма:
+https://snowballstem.org/algorithms/russian/stemmer.html
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+# Окончания, перед которыми должна стоять «а» или «я» (первая группа)
+# и которые ни в чем не нуждаются (вторая группа)
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'),
+                     ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+ADJECTIVE = ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой',
+             'ем', 'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых',
+             'ую', 'юю', 'ая', 'яя', 'ою', 'ею')
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = ('ся', 'сь')
+VERB = (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+         'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+        ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+         'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+         'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'))
+NOUN = ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+        'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+        'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+        'ья', 'я')
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+WORD = re.compile(r'\w+')
+
+
+class Endings:
+    """Набор окончаний с поиском самого длинного подходящего.
+
+    Вместо перебора всех окончаний проверяем по одному суффиксу слова
+    каждой встречающейся длины.
+    """
+    def __init__(self, plain=(), after_a=()):
+        self.after_a = dict.fromkeys(plain, False)
+        self.after_a.update(dict.fromkeys(after_a, True))
+        self.lengths = sorted({len(e) for e in self.after_a}, reverse=True)
+
+    def strip(self, rv):
+        """Отрезает от rv самое длинное подходящее окончание.
+
+        Возвращает новую строку или None, если ни одно не подошло.
+        """
+        for length in self.lengths:
+            if length > len(rv):
+                continue
+            needs_a = self.after_a.get(rv[-length:])
+            if needs_a is None:
+                continue
+            stem = rv[:-length]
+            if needs_a and not stem.endswith(('а', 'я')):
+                continue
+            return stem
+        return None
+
+
+_PERFECTIVE_GERUND = Endings(PERFECTIVE_GERUND[1], PERFECTIVE_GERUND[0])
+_ADJECTIVAL = Endings(
+    ADJECTIVE
+    + tuple(part + adj for part in PARTICIPLE[1] for adj in ADJECTIVE),
+    tuple(part + adj for part in PARTICIPLE[0] for adj in ADJECTIVE),
+)
+_VERB = Endings(VERB[1], VERB[0])
+_NOUN = Endings(NOUN)
+_SUPERLATIVE = Endings(SUPERLATIVE)
+
+
+def _region(word, start=0):
+    """Начало области после первой пары «гласная, согласная»."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _step1(rv):
+    stripped = _PERFECTIVE_GERUND.strip(rv)
+    if stripped is not None:
+        return stripped
+    if rv.endswith(REFLEXIVE):
+        rv = rv[:-2]
+    for endings in (_ADJECTIVAL, _VERB, _NOUN):
+        stripped = endings.strip(rv)
+        if stripped is not None:
+            return stripped
+    return rv
+
+
+def _step3(rv, r2):
+    # Словообразовательный суффикс отрезается только в области R2
+    for ending in DERIVATIONAL:
+        if rv.endswith(ending) and len(rv) - len(ending) >= r2:
+            return rv[:-len(ending)]
+    return rv
+
+
+def _step4(rv):
+    if rv.endswith('нн'):
+        return rv[:-1]
+    stripped = _SUPERLATIVE.strip(rv)
+    if stripped is not None:
+        return stripped[:-1] if stripped.endswith('нн') else stripped
+    if rv.endswith('ь'):
+        return rv[:-1]
+    return rv
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv_start = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+    r2_start = _region(word, _region(word))
+    prefix, rv = word[:rv_start], word[rv_start:]
+    rv = _step1(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    rv = _step3(rv, max(r2_start - rv_start, 0))
+    return prefix + _step4(rv)
+
+
+def tokenize(text):
+    """Основы слов текста в порядке следования."""
+    return [stem(word) for word in WORD.findall(text.lower())]
@@ -0,0 +1,114 @@
+"""Загрузчики шаблонов с замером времени рендера.
+
+Шаблоны, которые они отдают, сообщают PerformanceMiddleware, сколько
+рендерился каждый из них, включая {% include %} и родителя из
+{% extends %}. Время включающее: у base.html в него входит вся
+страница, у print_posts.html - все карточки; общее время шаблонов
+запроса складывается только из внешних рендеров. Вне замеряемых
+запросов обвязка стоит одну проверку.
+
+Loader оборачивает обычные загрузчики и перечитывает шаблоны при каждом
+обращении, как и DjangoTemplates в режиме DEBUG. CachedLoader -
+django.template.loaders.cached.Loader с теми же замерами: шаблон
+компилируется один раз на процесс, а warm_up() делает это при старте,
+чтобы первые запросы каждого воркера не платили за разбор шаблонов.
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.template import Template, TemplateDoesNotExist, engines
+from django.template.loaders import cached
+from django.template.loaders.base import Loader as BaseLoader
+from django.template.utils import get_app_template_dirs
+
+from .middleware import current_metrics
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt')
+
+
+class TimedTemplate(Template):
+    def _render(self, context):
+        metrics = current_metrics()
+        if metrics is None:
+            return super()._render(context)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super()._render(context)
+        finally:
+            seconds = time.perf_counter() - started
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.templates += seconds
+            metrics.add_template(self.origin.template_name, seconds)
+
+
+class TimingLoader(BaseLoader):
+    """get_template из BaseLoader, но шаблоны - TimedTemplate."""
+    def get_template(self, template_name, skip=None):
+        tried = []
+        for origin in self.get_template_sources(template_name):
+            if skip is not None and origin in skip:
+                tried.append((origin, 'Skipped'))
+                continue
+            try:
+                contents = self.get_contents(origin)
+            except TemplateDoesNotExist:
+                tried.append((origin, 'Source does not exist'))
+                continue
+            return TimedTemplate(
+                contents, origin, origin.template_name, self.engine,
+            )
+        raise TemplateDoesNotExist(template_name, tried=tried)
+
+
+class Loader(TimingLoader):
+    def __init__(self, engine, loaders):
+        self.loaders = engine.get_template_loaders(loaders)
+        super().__init__(engine)
+
+    def get_contents(self, origin):
+        return origin.loader.get_contents(origin)
+
+    def get_template_sources(self, template_name):
+        for loader in self.loaders:
+            yield from loader.get_template_sources(template_name)
+
+
+class CachedLoader(cached.Loader, TimingLoader):
+    pass
+
+
+def _template_names(directory):
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(TEMPLATE_EXTENSIONS):
+                path = os.path.relpath(os.path.join(root, name), directory)
+                yield path.replace(os.sep, '/')
+
+
+def warm_up(engine=None):
+    """Заранее загружает шаблоны проекта (и загружает их теги), чтобы
+    кэширующий загрузчик отдавал их уже скомпилированными.
+
+    Возвращает число загруженных шаблонов.
+    """
+    engine = engine or engines['django'].engine
+    directories = list(engine.dirs) + [
+        directory for directory in get_app_template_dirs('templates')
+        if directory.startswith(settings.BASE_DIR)
+    ]
+    loaded = 0
+    for directory in directories:
+        for name in _template_names(directory):
+            try:
+                engine.get_template(name)
+            except Exception as error:
+                logger.warning('Шаблон %s не загрузился: %s', name, error)
+            else:
+                loaded += 1
+    return loaded
@@ -0,0 +1,18 @@
+from django import template
+from django.conf import settings as s
+
+from ..paginators import page_window as window
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page_obj, on_each_side=None, on_ends=1):
+    """Номера страниц вокруг текущей для includes/paginator.html:
+    {% page_window page_obj as pages %}, пропуски - None.
+    """
+    if on_each_side is None:
+        on_each_side = s.PAGINATOR_WINDOW
+    return list(window(
+        page_obj.number, page_obj.paginator.num_pages, on_each_side, on_ends
+    ))
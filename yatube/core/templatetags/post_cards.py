@@ -0,0 +1,23 @@
+from django import template
+
+from posts import cards
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/print_posts.html')
+def render_post_list(posts, profile_link=False):
+    """Список постов страницы: {% render_post_list page_obj %}.
+
+    Все страницы со списками постов рисуются этим тегом: карточки
+    берутся из кэша, недостающие рендерятся пачкой (см. posts/cards.py).
+    """
+    return {'cards': cards.render_cards(posts, profile_link)}
+
+
+@register.simple_tag
+def post_cards(posts, profile_link=False):
+    """Те же карточки списком, для шаблонов, которым нужен свой цикл:
+    {% post_cards page_obj as cards %}.
+    """
+    return cards.render_cards(posts, profile_link)
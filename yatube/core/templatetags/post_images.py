@@ -0,0 +1,23 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(image, geometry, **options):
+    """Миниатюра картинки или None, пока она не подготовлена."""
+    return thumbnails.resolve(image, geometry, **options)
+
+
+@register.simple_tag
+def thumbnail_sources(image, geometry, **options):
+    """Готовые миниатюры в дополнительных форматах для <picture>."""
+    return thumbnails.sources(image, geometry, **options)
+
+
+@register.simple_tag
+def thumbnail_placeholder(geometry):
+    """Заглушка размера geometry, пока миниатюра готовится."""
+    return thumbnails.placeholder(geometry)
@@ -0,0 +1,27 @@
+import logging
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class StrictQueryRunner(DiscoverRunner):
+    """Запускает тесты с QUERY_STRICT: вьюха, превысившая бюджет
+    запросов или сделавшая N+1, роняет тест (см. core/queries.py).
+
+    Строки замеров yatube.performance в выводе тестов не нужны: логгер
+    пишет в NullHandler, а тесты проверяют его через assertLogs.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.strict_queries = override_settings(QUERY_STRICT=True)
+        self.strict_queries.enable()
+        logger = logging.getLogger('yatube.performance')
+        self.performance_handlers = logger.handlers
+        logger.handlers = [logging.NullHandler()]
+
+    def teardown_test_environment(self, **kwargs):
+        logging.getLogger('yatube.performance').handlers = (
+            self.performance_handlers
+        )
+        self.strict_queries.disable()
+        super().teardown_test_environment(**kwargs)
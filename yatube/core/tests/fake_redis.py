@@ -0,0 +1,155 @@
+"""Сервер с протоколом Redis в памяти процесса для тестов кэша.
+
+Понимает только команды, которые использует core.cache.backends.
+"""
+import socketserver
+import threading
+import time
+
+from core.cache.backends import INCR_EXISTING
+
+
+def _bulk(value):
+    if value is None:
+        return b'$-1\r\n'
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                command = self._read_command()
+            except ConnectionError:
+                return
+            if command is None:
+                return
+            self.wfile.write(self.server.dispatch(command))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            raise ConnectionError(line)
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeRedisHandler)
+        self.data = {}
+        self.commands = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f'redis://{host}:{port}/0'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+    def _alive(self, key):
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def dispatch(self, args):
+        name = args[0].upper().decode()
+        with self._lock:
+            self.commands.append(name)
+            handler = getattr(self, f'cmd_{name.lower()}', None)
+            if handler is None:
+                return b'-ERR unknown command\r\n'
+            return handler(*args[1:])
+
+    def cmd_ping(self):
+        return b'+PONG\r\n'
+
+    def cmd_select(self, db):
+        return b'+OK\r\n'
+
+    def cmd_get(self, key):
+        return _bulk(self._alive(key))
+
+    def cmd_mget(self, *keys):
+        return b'*%d\r\n' % len(keys) + b''.join(
+            _bulk(self._alive(key)) for key in keys
+        )
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        expires = None
+        if b'PX' in options:
+            milliseconds = int(options[options.index(b'PX') + 1])
+            expires = time.monotonic() + milliseconds / 1000
+        if b'NX' in options and self._alive(key) is not None:
+            return _bulk(None)
+        self.data[key] = (value, expires)
+        return b'+OK\r\n'
+
+    def cmd_del(self, *keys):
+        removed = sum(
+            self.data.pop(key, None) is not None for key in keys
+        )
+        return b':%d\r\n' % removed
+
+    def cmd_exists(self, *keys):
+        return b':%d\r\n' % sum(self._alive(key) is not None for key in keys)
+
+    def cmd_incrby(self, key, delta):
+        value = int(self._alive(key) or 0) + int(delta)
+        expires = self.data.get(key, (None, None))[1]
+        self.data[key] = (b'%d' % value, expires)
+        return b':%d\r\n' % value
+
+    def cmd_eval(self, script, numkeys, key, *args):
+        # Вместо Lua - только скрипт, который использует RedisCache
+        if script != INCR_EXISTING.encode():
+            return b'-ERR unknown script\r\n'
+        if self._alive(key) is None:
+            return _bulk(None)
+        return self.cmd_incrby(key, *args)
+
+    def cmd_pexpire(self, key, milliseconds):
+        value = self._alive(key)
+        if value is None:
+            return b':0\r\n'
+        self.data[key] = (value, time.monotonic() + int(milliseconds) / 1000)
+        return b':1\r\n'
+
+    def cmd_persist(self, key):
+        value = self._alive(key)
+        if value is None:
+            return b':0\r\n'
+        self.data[key] = (value, None)
+        return b':1\r\n'
+
+    def cmd_flushdb(self):
+        self.data.clear()
+        return b'+OK\r\n'
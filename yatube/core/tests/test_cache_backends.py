@@ -0,0 +1,138 @@
+import time
+
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from posts.models import Post, User
+
+from core.cache.backends import RedisCache, TwoTierCache
+
+from .fake_redis import FakeRedisServer
+
+
+class RedisCacheTest(TestCase):
+    def setUp(self):
+        self.server = FakeRedisServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.cache = RedisCache(self.server.url, {'TIMEOUT': 60})
+
+    def test_basic_operations(self):
+        """get/set/add/delete/incr работают поверх протокола Redis."""
+        self.cache.set('post', {'text': 'Привет'})
+        self.assertEqual(self.cache.get('post'), {'text': 'Привет'})
+        self.assertFalse(self.cache.add('post', 'другое значение'))
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.get('counter'), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.delete('post')
+        self.assertIsNone(self.cache.get('post'))
+
+    def test_incr_is_atomic_and_keeps_ttl(self):
+        """incr - одна команда на сервере: истекший ключ не создается
+        заново, а живой сохраняет срок жизни.
+        """
+        self.cache.set('count', 10, timeout=0.05)
+        self.server.commands.clear()
+        self.assertEqual(self.cache.incr('count', -1), 9)
+        self.assertEqual(self.server.commands, ['EVAL'])
+        time.sleep(0.1)
+        with self.assertRaises(ValueError):
+            self.cache.incr('count')
+        self.assertIsNone(self.cache.get('count'))
+
+    def test_many_and_timeouts(self):
+        """get_many/set_many идут одной командой, сроки жизни соблюдаются."""
+        self.cache.set_many({'a': 1, 'b': [2]})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': [2]})
+        self.cache.set('short', 'x', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.cache.set('forever', 'x', timeout=None)
+        self.assertEqual(self.cache.get('forever'), 'x')
+
+    def test_connections_are_pooled(self):
+        """Последовательные обращения переиспользуют одно соединение."""
+        for i in range(20):
+            self.cache.set(f'key{i}', i)
+            self.cache.get(f'key{i}')
+        self.assertEqual(self.server.connections, 1)
+
+
+class TwoTierCacheTest(TestCase):
+    def setUp(self):
+        self.server = FakeRedisServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'shared': {
+                'BACKEND': 'core.cache.backends.RedisCache',
+                'LOCATION': self.server.url,
+            },
+        })
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        params = {'OPTIONS': {'LOCAL_TIMEOUT': 0.2}}
+        self.cache = TwoTierCache('shared', params)
+
+    def test_hot_keys_are_read_locally(self):
+        """Повторное чтение ключа не обращается к общему серверу."""
+        self.cache.set('key', 'value')
+        sent = len(self.server.commands)
+        for _ in range(10):
+            self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(len(self.server.commands), sent)
+
+    def test_incr_goes_to_shared_tier(self):
+        """incr выполняется в общем кэше и сбрасывает локальную копию."""
+        self.cache.set('version', 1)
+        self.cache.get('version')
+        self.assertEqual(self.cache.incr('version'), 2)
+        self.assertEqual(self.cache.get('version'), 2)
+
+    def test_other_worker_sees_changes_after_local_timeout(self):
+        """Локальная копия другого воркера устаревает за LOCAL_TIMEOUT."""
+        self.cache.set('version', 1)
+        self.assertEqual(self.cache.get('version'), 1)
+        # Изменение, сделанное другим воркером напрямую в общем кэше
+        caches['shared'].incr('version')
+        self.assertEqual(self.cache.get('version'), 1)
+        time.sleep(0.25)
+        self.assertEqual(self.cache.get('version'), 2)
+
+
+class SharedCachePagesTest(TestCase):
+    """Страницы с версионным кэшем работают поверх общего кэша."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='leo')
+
+    def setUp(self):
+        self.server = FakeRedisServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'core.cache.backends.TwoTierCache',
+                'LOCATION': 'shared',
+                'OPTIONS': {'LOCAL_TIMEOUT': 2},
+            },
+            'shared': {
+                'BACKEND': 'core.cache.backends.RedisCache',
+                'LOCATION': self.server.url,
+            },
+        })
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.guest_client = Client()
+
+    def test_index_page_invalidated_through_shared_cache(self):
+        """Новый пост сбрасывает кэш главной страницы в общем кэше."""
+        self.guest_client.get('/')
+        Post.objects.create(text='Пост через общий кэш', author=self.user)
+        response = self.guest_client.get('/')
+        self.assertContains(response, 'Пост через общий кэш')
+        self.assertIn('EVAL', self.server.commands)
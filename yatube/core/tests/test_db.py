@@ -0,0 +1,25 @@
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+
+
+class SqlitePragmasTest(SimpleTestCase):
+    databases = {'default'}
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def new_connection(self):
+        wrapper = connection.copy()
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -64000,
+                                       'busy_timeout': 1234})
+    def test_pragmas_applied_to_new_connections(self):
+        """PRAGMA из настроек выполняются при открытии соединения."""
+        wrapper = self.new_connection()
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -64000)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
@@ -0,0 +1,53 @@
+import json
+
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from posts.models import Post, User
+
+
+@override_settings(PERF_SAMPLE_RATE=1)
+class PerformanceMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_logged(self, path):
+        with self.assertLogs('yatube.performance') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(path)
+        return response, json.loads(logs.records[0].getMessage()), queries
+
+    def test_metrics(self):
+        """Замеры попадают в Server-Timing и в строку лога."""
+        response, record, queries = self.get_logged('/')
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['queries'], len(queries))
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreater(record['cache_misses'], 0)
+        timing = response['Server-Timing']
+        self.assertIn(f'db;dur={record["sql_ms"]:.1f}', timing)
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertIn('tpl;dur=', timing)
+        # После запроса кэш потока снова без обвязки
+        self.assertNotIn('get', vars(caches['default']))
+
+    def test_cache_hits(self):
+        """Повторный запрос страницы отдается из кэша и это видно."""
+        self.get_logged('/')
+        _, record, _ = self.get_logged('/')
+        self.assertGreater(record['cache_hits'], 0)
+        self.assertEqual(record['cache_misses'], 0)
+
+    @override_settings(PERF_SAMPLE_RATE=0, QUERY_STRICT=False)
+    def test_not_sampled(self):
+        """Запросы вне выборки не замеряются."""
+        response = self.client.get('/')
+        self.assertNotIn('Server-Timing', response)
@@ -0,0 +1,72 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from posts.models import Post, User
+
+from core.middleware import PerformanceMiddleware
+from core.queries import QueryProblem, exempt, query_budget, shape
+
+
+def posts_one_by_one(request):
+    """Вьюха с N+1: отдельный запрос автора для каждого поста."""
+    names = [post.author.username for post in Post.objects.all()]
+    return HttpResponse(', '.join(names))
+
+
+@query_budget(1)
+def two_queries(request):
+    Post.objects.count()
+    User.objects.count()
+    return HttpResponse()
+
+
+@override_settings(QUERY_STRICT=True, PERF_SAMPLE_RATE=0,
+                   QUERY_REPEAT_THRESHOLD=3)
+class QueryDetectorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for i in range(3):
+            user = User.objects.create(username=f'author{i}')
+            Post.objects.create(text='Пост', author=user)
+
+    def call(self, view):
+        request = RequestFactory().get('/')
+        middleware = PerformanceMiddleware(
+            lambda request: middleware.process_view(request, view, (), {})
+            or view(request)
+        )
+        return middleware(request)
+
+    def test_shape(self):
+        """Литералы и длина списков IN не меняют форму запроса."""
+        self.assertEqual(
+            shape('SELECT * FROM t WHERE id IN (%s, %s, %s) '
+                  "AND name = 'x' LIMIT 10"),
+            shape('SELECT *  FROM t WHERE id IN (%s) '
+                  "AND name = 'y' LIMIT 20"),
+        )
+
+    def test_repeated_queries(self):
+        """N+1 роняет запрос в строгом режиме и указывает место в коде."""
+        with self.assertRaisesRegex(QueryProblem, 'test_queries.py:11'):
+            self.call(posts_one_by_one)
+
+    def test_allowed_repeats(self):
+        """Повторы внутри exempt не считаются N+1."""
+        def view(request):
+            with exempt():
+                return posts_one_by_one(request)
+        self.assertEqual(self.call(view).status_code, 200)
+
+    def test_budget(self):
+        """Вьюха не может сделать больше запросов, чем объявила."""
+        with self.assertRaisesRegex(QueryProblem, '2 запросов при бюджете 1'):
+            self.call(two_queries)
+
+    @override_settings(QUERY_STRICT=False)
+    def test_logged_outside_strict_mode(self):
+        """Без строгого режима проблемы только пишутся в лог."""
+        with override_settings(PERF_SAMPLE_RATE=1):
+            with self.assertLogs('yatube.performance', 'WARNING') as logs:
+                self.assertEqual(self.call(two_queries).status_code, 200)
+        self.assertIn('бюджете 1', logs.output[0])
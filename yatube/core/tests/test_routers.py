@@ -0,0 +1,100 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.cache import INDEX_SCOPE, page_cache_context
+from posts.models import Post, User
+
+from core import routers
+
+REPLICA = 'replica_test'
+
+
+@override_settings(REPLICA_ALIAS=REPLICA)
+class ReplicaRoutingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Реплика - отдельный файл SQLite. Алиас добавляется после
+        # setUpClass, чтобы TestCase не открывал на нем транзакцию:
+        # реплика видит только то, что в нее скопировано
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        }
+        cls.author = User.objects.create(username='author')
+        Post.objects.create(text='Пост есть на реплике', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections.databases[REPLICA]
+        delattr(connections._connections, REPLICA)
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+        # Снимок основной базы: реплика, которая отстает на одну запись
+        connections[REPLICA].close()
+        path = connections[REPLICA].settings_dict['NAME']
+        if os.path.exists(path):
+            os.remove(path)
+        connection.ensure_connection()
+        # Дамп через то же соединение видит данные открытой транзакции.
+        # Таблицы FTS5 iterdump восстановить не умеет, страницам они
+        # не нужны
+        target = sqlite3.connect(path)
+        target.executescript('\n'.join(
+            statement for statement in connection.connection.iterdump()
+            if 'search_fts' not in statement
+        ))
+        target.close()
+        Post.objects.create(text='Пост еще не на реплике', author=self.author)
+
+    def test_reads_go_to_replica(self):
+        """Без записи страницы читаются с реплики."""
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'Пост есть на реплике')
+        self.assertNotContains(response, 'Пост еще не на реплике')
+
+    def test_read_your_writes(self):
+        """После записи браузер какое-то время читает основную базу."""
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Свежий пост'}
+        )
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+        self.assertContains(response, 'Пост еще не на реплике')
+        # Другие посетители пока читают реплику
+        response = Client().get(reverse('posts:index'))
+        self.assertNotContains(response, 'Свежий пост')
+
+    def test_replica_pages_are_cached_apart(self):
+        """Страница, собранная с реплики, не достается тем, кто читает
+        основную базу, и кэшируется не дольше REPLICA_PIN_SECONDS.
+        """
+        Client().get(reverse('posts:index'))
+        pinned = Client()
+        pinned.cookies[settings.REPLICA_PIN_COOKIE] = '1'
+        response = pinned.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост еще не на реплике')
+        routers.start_request()
+        try:
+            context = page_cache_context(INDEX_SCOPE)
+        finally:
+            routers.end_request()
+        self.assertEqual(context['cache_alias'], REPLICA)
+        self.assertEqual(context['cache_timeout'],
+                         settings.REPLICA_PIN_SECONDS)
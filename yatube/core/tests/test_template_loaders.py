@@ -0,0 +1,70 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.backends.django import DjangoTemplates
+from django.test import SimpleTestCase, TestCase, override_settings
+from posts.models import Post, User
+
+from core.template_loaders import TimedTemplate, warm_up
+
+FILESYSTEM_LOADER = 'django.template.loaders.filesystem.Loader'
+
+
+def cached_engine():
+    return DjangoTemplates({
+        'NAME': 'cached',
+        'DIRS': [settings.TEMPLATES_DIR],
+        'APP_DIRS': False,
+        'OPTIONS': {'loaders': [
+            ('core.template_loaders.CachedLoader', [FILESYSTEM_LOADER]),
+        ]},
+    }).engine
+
+
+class CachedLoaderTest(SimpleTestCase):
+    def test_templates_are_compiled_once(self):
+        """Кэширующий загрузчик отдает один и тот же TimedTemplate."""
+        engine = cached_engine()
+        template = engine.get_template('includes/post_card.html')
+        self.assertIsInstance(template, TimedTemplate)
+        self.assertIs(engine.get_template('includes/post_card.html'),
+                      template)
+
+    def test_warm_up(self):
+        """Прогрев загружает шаблоны проекта в кэш загрузчика."""
+        engine = cached_engine()
+        self.assertGreater(warm_up(engine), 0)
+        loader = engine.template_loaders[0]
+        self.assertIn('base.html', loader.get_template_cache)
+        self.assertIn('includes/paginator.html', loader.get_template_cache)
+
+
+@override_settings(PERF_SAMPLE_RATE=1)
+class TemplateTimingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_includes_are_timed(self):
+        """В строке лога есть время страницы, родителя и каждого include."""
+        with self.assertLogs('yatube.performance') as logs:
+            self.client.get('/')
+        record = json.loads(logs.records[0].getMessage())
+        templates = record['templates']
+        # Общее время - только внешний рендер, include не складываются
+        self.assertEqual(record['template_ms'],
+                         templates['posts/index.html']['ms'])
+        for name in ('posts/index.html', 'base.html',
+                     'includes/print_posts.html', 'includes/paginator.html'):
+            with self.subTest(template=name):
+                self.assertEqual(templates[name]['calls'], 1)
+        self.assertEqual(templates['includes/post_card.html']['calls'], 3)
+        self.assertGreaterEqual(templates['base.html']['ms'],
+                                templates['includes/print_posts.html']['ms'])
@@ -0,0 +1,115 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts.models import Post, User
+
+from core.uploads import ImageLimitUploadHandler, RejectedUpload
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_file(name, size, fmt='JPEG', **save_options):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, fmt, **save_options)
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type=Image.MIME[fmt])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, image):
+        return self.client.post(reverse('posts:post_create'), data={
+            'text': 'пост с картинкой', 'image': image,
+        })
+
+    @override_settings(UPLOAD_IMAGE_MAX_BYTES=1024)
+    def test_too_big_file_is_rejected(self):
+        """Файл больше лимита отбрасывается еще при загрузке."""
+        response = self.create_post(
+            image_file('big.png', (300, 300), 'PNG', compress_level=0)
+        )
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(response, 'form', 'image',
+                             'Файл больше 1,0\xa0КБ.')
+
+    @override_settings(UPLOAD_IMAGE_MAX_PIXELS=10 ** 6)
+    def test_too_many_pixels_are_rejected_by_header(self):
+        """Картинка с огромным разрешением не декодируется."""
+        response = self.create_post(image_file('bomb.png', (2000, 1000),
+                                               'PNG'))
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка слишком большая: не больше 1 мегапикселей.'
+        )
+
+    @override_settings(UPLOAD_IMAGE_MAX_SIDE=400)
+    def test_large_image_is_downscaled_without_metadata(self):
+        """Большая фотография уменьшается и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        self.create_post(image_file('photo.jpg', (1600, 800),
+                                    exif=exif.tobytes()))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (400, 200))
+            self.assertNotIn('exif', stored.info)
+
+    def test_small_image_is_accepted(self):
+        """Картинка в пределах лимитов сохраняется с исходным размером."""
+        self.create_post(image_file('small.png', (120, 80), 'PNG'))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (120, 80))
+
+
+class ImageLimitUploadHandlerTest(TestCase):
+    def stream(self, content, chunk_size=1024):
+        handler = ImageLimitUploadHandler()
+        handler.new_file('image', 'bomb.png', 'image/png', None)
+        passed = 0
+        for start in range(0, len(content), chunk_size):
+            if handler.receive_data_chunk(
+                    content[start:start + chunk_size], start) is not None:
+                passed += 1
+        return handler.file_complete(len(content)), passed
+
+    @override_settings(UPLOAD_IMAGE_MAX_PIXELS=10 ** 6)
+    def test_stops_passing_chunks_after_header(self):
+        """Размер берется из заголовка, дальше файл не передается."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (2000, 1000)).save(buffer, 'PNG', compress_level=0)
+        result, passed = self.stream(buffer.getvalue())
+        self.assertIsInstance(result, RejectedUpload)
+        self.assertEqual(result.reason, 'pixels')
+        self.assertEqual(passed, 0)
+
+    def test_accepted_file_goes_to_next_handler(self):
+        """Файл в пределах лимитов обрабатывают следующие обработчики."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (20, 10)).save(buffer, 'PNG')
+        result, passed = self.stream(buffer.getvalue(), chunk_size=16)
+        self.assertIsNone(result)
+        self.assertGreater(passed, 0)
@@ -0,0 +1,125 @@
+"""Ограничения на загружаемые картинки.
+
+ImageLimitUploadHandler стоит первым в FILE_UPLOAD_HANDLERS и смотрит на
+поток байтов до того, как файл целиком окажется в памяти или на диске:
+отбрасывает файл, как только он превысил UPLOAD_IMAGE_MAX_BYTES, и
+читает размер картинки из заголовка, чтобы не пускать дальше
+декомпрессионные бомбы. Отклоненный файл приходит в форму как
+RejectedUpload, и поле формы показывает пользователю причину.
+"""
+import io
+
+from django.conf import settings as s
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, ImageOps
+
+# Сколько первых байтов файла пробуем разобрать как заголовок картинки
+HEADER_LIMIT = 64 * 1024
+# Форматы, которые сохраняем как есть; остальные перекодируем в JPEG
+KEEP_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+
+class RejectedUpload(UploadedFile):
+    """Файл, отброшенный при загрузке; содержимое не сохраняется."""
+    def __init__(self, name, size, reason):
+        super().__init__(io.BytesIO(), name=name, size=size)
+        self.reason = reason
+
+
+def too_many_pixels(width, height):
+    return width * height > s.UPLOAD_IMAGE_MAX_PIXELS
+
+
+def too_many_bytes(size):
+    return size > s.UPLOAD_IMAGE_MAX_BYTES
+
+
+def read_size(file_):
+    """Размер картинки по заголовку, без декодирования; None - не картинка."""
+    try:
+        with Image.open(file_) as image:
+            return image.size
+    except Image.DecompressionBombError:
+        # Pillow сам отказался открывать: пикселей заведомо слишком много
+        return (s.UPLOAD_IMAGE_MAX_PIXELS, 2)
+    except Exception:
+        return None
+
+
+class ImageLimitUploadHandler(FileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.size_known = False
+        self.reason = None
+        if self.content_length and too_many_bytes(self.content_length):
+            self.reason = 'size'
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.reason is None and too_many_bytes(self.received):
+            self.reason = 'size'
+        if self.reason is None and not self.size_known:
+            self._check_header(raw_data)
+        if self.reason is not None:
+            # Дальше файл никому не передаем: остаток просто вычитывается
+            return None
+        return raw_data
+
+    def _check_header(self, raw_data):
+        self.header += raw_data[:HEADER_LIMIT - len(self.header)]
+        size = read_size(io.BytesIO(self.header))
+        if size is not None:
+            self.size_known = True
+            if too_many_pixels(*size):
+                self.reason = 'pixels'
+        elif len(self.header) >= HEADER_LIMIT:
+            # Длинный заголовок (например, большой EXIF): размер
+            # проверит поле формы по готовому файлу
+            self.size_known = True
+        if self.size_known:
+            self.header = b''
+
+    def file_complete(self, file_size):
+        if self.reason is None:
+            return None
+        return RejectedUpload(self.file_name, self.received, self.reason)
+
+
+def normalize_image(file_, name):
+    """Перекодирует картинку: уменьшает до UPLOAD_IMAGE_MAX_SIDE
+    по большей стороне, учитывает ориентацию из EXIF и не переносит
+    метаданные (EXIF, GPS, ICC-комментарии) в сохраняемый файл.
+    """
+    file_.seek(0)
+    image = Image.open(file_)
+    fmt = image.format if image.format in KEEP_FORMATS else 'JPEG'
+    limit = s.UPLOAD_IMAGE_MAX_SIDE
+    if getattr(image, 'is_animated', False) and max(image.size) <= limit:
+        # Анимацию не пересобираем: перекодирование оставило бы
+        # только первый кадр
+        file_.seek(0)
+        return file_
+    if fmt == 'JPEG':
+        # draft() декодирует JPEG сразу в уменьшенном масштабе:
+        # большая фотография не разворачивается в память целиком
+        image.draft('RGB', (limit, limit))
+    image = ImageOps.exif_transpose(image)
+    if max(image.size) > limit:
+        image.thumbnail((limit, limit), Image.LANCZOS)
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    options = {'optimize': True}
+    if fmt == 'JPEG':
+        options.update(quality=s.UPLOAD_IMAGE_QUALITY, progressive=True)
+    if fmt == 'GIF' and 'transparency' in image.info:
+        options['transparency'] = image.info['transparency']
+    output = io.BytesIO()
+    image.save(output, fmt, **options)
+    if fmt == 'JPEG' and not name.lower().endswith(('.jpg', '.jpeg')):
+        name = name.rsplit('.', 1)[0] + '.jpg'
+    return SimpleUploadedFile(
+        name, output.getvalue(), content_type=Image.MIME[fmt]
+    )
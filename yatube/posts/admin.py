@@ -1,6 +1,8 @@
+from django.conf import settings as s
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import SearchResults
 
 admin.site.register(Group)
 
@@ -13,6 +15,14 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по всей таблице ищем по поисковому индексу
+        if not search_term:
+            return queryset, False
+        results = SearchResults(search_term)
+        ids = [post.pk for post in results[:s.SEARCH_ADMIN_LIMIT]]
+        return queryset.filter(pk__in=ids), False
+
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
@@ -0,0 +1,234 @@
+"""Нагрузочный прогон страниц постов.
+
+generate() заполняет БД правдоподобными данными: тексты и имена
+придумывает mixer, авторство постов и подписки распределены по
+степенному закону (у немногих авторов большая часть постов и
+подписчиков, как в настоящих соцсетях). run() прогоняет страницы
+через тестовый клиент Django и собирает p50/p95 времени ответа, число
+SQL-запросов и пиковую память на запрос. Используется командой
+benchmark.
+"""
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from django.conf import settings as s
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from mixer.backend.django import mixer
+
+from . import counters, feed, search
+from .cache import (INDEX_SCOPE, author_scope, bump, forget_counts,
+                    group_scope)
+from .models import Comment, Follow, Group, Post
+from .transfer import original_dates
+
+User = get_user_model()
+
+# Показатель степенного закона для популярности авторов
+ZIPF_EXPONENT = 1.1
+MEMORY_SAMPLES = 3
+SCENARIOS = ('index', 'group_posts', 'profile', 'post_detail',
+             'follow_index', 'add_comment')
+
+
+def _zipf_weights(count):
+    return [1 / rank ** ZIPF_EXPONENT for rank in range(1, count + 1)]
+
+
+def _batches(objects, size):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(model, objects, batch_size, **options):
+    """bulk_create пачками; размер пачки внутри запроса Django подберет
+    сам с учетом лимита параметров SQLite.
+    """
+    for batch in _batches(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, **options)
+
+
+def generate(log, posts=10000, users=None, groups=20, comments_per_post=2,
+             follows_per_user=20, batch_size=1000, seed=1):
+    """Создает набор данных и производные таблицы (счетчики, ленты,
+    поисковый индекс). Возвращает описание набора для отчета.
+
+    log - куда писать ход работы, например self.stdout.write команды.
+    """
+    rng = random.Random(seed)
+    users = users or max(posts // 20, 10)
+    now = datetime.now()
+    with mixer.ctx(commit=False), original_dates():
+        _insert(User, (
+            mixer.blend(User, username=f'bench{i}') for i in range(users)
+        ), batch_size)
+        _insert(Group, (
+            mixer.blend(Group, slug=f'bench-group-{i}')
+            for i in range(groups)
+        ), batch_size)
+        user_ids = list(User.objects.filter(
+            username__startswith='bench'
+        ).order_by('id').values_list('id', flat=True))
+        group_ids = list(Group.objects.filter(
+            slug__startswith='bench-group-'
+        ).values_list('id', flat=True))
+        weights = _zipf_weights(len(user_ids))
+        authors = rng.choices(user_ids, weights, k=posts)
+        # Часть постов без группы, как на живом сайте
+        group_choices = group_ids + [None]
+        _insert(Post, (
+            mixer.blend(
+                Post, author_id=author_id, image='',
+                group_id=rng.choice(group_choices),
+                pub_date=now - timedelta(minutes=posts - i),
+            ) for i, author_id in enumerate(authors)
+        ), batch_size)
+        log(f'Создано постов: {posts}')
+        post_ids = list(Post.objects.values_list('id', flat=True))
+        _insert(Comment, (
+            # UUIDField mixer заполнять не умеет
+            mixer.blend(Comment, post_id=rng.choice(post_ids),
+                        author_id=rng.choice(user_ids), created=now,
+                        queue_token=None)
+            for _ in range(posts * comments_per_post)
+        ), batch_size)
+    follows = set()
+    for user_id in user_ids:
+        for author_id in rng.choices(user_ids, weights,
+                                     k=follows_per_user):
+            if author_id != user_id:
+                follows.add((user_id, author_id))
+    _insert(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in follows
+    ), batch_size, ignore_conflicts=True)
+    log('Пересчет счетчиков, лент и поискового индекса')
+    counters.recount_comments()
+    counters.recount_authors()
+    feed.rebuild()
+    search.rebuild()
+    # Посты вставлены в обход сигналов
+    group_scopes = [group_scope(group_id) for group_id in group_ids]
+    forget_counts(INDEX_SCOPE, *group_scopes)
+    bump(INDEX_SCOPE, *group_scopes, *(
+        author_scope(user_id) for user_id in user_ids
+    ))
+    return {
+        'posts': posts, 'users': users, 'groups': groups,
+        'comments': posts * comments_per_post, 'follows': len(follows),
+        'seed': seed,
+    }
+
+
+class Runner:
+    """Прогоняет сценарии и собирает метрики по каждому запросу."""
+    def __init__(self, requests=50, cold=False, seed=1):
+        self.requests = requests
+        self.cold = cold
+        self.rng = random.Random(seed)
+        self.guest = Client()
+        self.reader = Client()
+        # Самый активный читатель: у него самая длинная лента
+        self.reader_user = User.objects.order_by(
+            '-stats__following_count'
+        ).first()
+        self.reader.force_login(self.reader_user)
+        self.groups = list(Group.objects.values_list('slug', flat=True))
+        self.authors = list(User.objects.filter(
+            stats__post_count__gt=0
+        ).order_by('-stats__post_count').values_list('username', flat=True))
+        self.post_ids = list(Post.objects.values_list('id', flat=True))
+        self.pages = max(1, min(5, len(self.post_ids) // s.POSTS_PER_PAGE))
+
+    def _index(self):
+        return self.guest.get('/', {'page': self.rng.randint(1, self.pages)})
+
+    def _group_posts(self):
+        return self.guest.get(f'/group/{self.rng.choice(self.groups)}/')
+
+    def _profile(self):
+        # Популярные профили открывают чаще
+        authors = self.authors[:max(1, len(self.authors) // 10)]
+        return self.guest.get(f'/profile/{self.rng.choice(authors)}/')
+
+    def _post_detail(self):
+        return self.guest.get(f'/posts/{self.rng.choice(self.post_ids)}/')
+
+    def _follow_index(self):
+        return self.reader.get('/follow/')
+
+    def _add_comment(self):
+        post_id = self.rng.choice(self.post_ids)
+        return self.reader.post(f'/posts/{post_id}/comment/',
+                                {'text': 'Нагрузочный комментарий'})
+
+    def _call(self, scenario, request):
+        if self.cold:
+            cache.clear()
+        response = request()
+        if response.status_code >= 400:
+            raise RuntimeError(f'{scenario}: ответ {response.status_code}')
+
+    def measure(self, scenario):
+        request = getattr(self, f'_{scenario}')
+        self._call(scenario, request)  # прогрев
+        timings, queries = [], []
+        for _ in range(self.requests):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                self._call(scenario, request)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured.captured_queries))
+        # tracemalloc замедляет код в разы, поэтому память меряем
+        # отдельными запросами, а не вместе со временем
+        peaks = []
+        for _ in range(MEMORY_SAMPLES):
+            tracemalloc.start()
+            self._call(scenario, request)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        timings.sort()
+        return {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[int(0.95 * (len(timings) - 1))], 2),
+            'queries': max(queries),
+            'peak_kb': round(max(peaks) / 1024, 1),
+        }
+
+    def run(self, scenarios=SCENARIOS):
+        return {scenario: self.measure(scenario) for scenario in scenarios}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Регрессии относительно базовой линии: время p95 выросло больше
+    чем на tolerance, либо запросов к БД стало больше.
+    """
+    regressions = []
+    for scenario, current in results.items():
+        before = baseline.get(scenario)
+        if before is None:
+            continue
+        if current['queries'] > before['queries']:
+            regressions.append(
+                f'{scenario}: запросов {before["queries"]} -> '
+                f'{current["queries"]}'
+            )
+        if current['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{scenario}: p95 {before["p95_ms"]} -> '
+                f'{current["p95_ms"]} мс'
+            )
+    return regressions
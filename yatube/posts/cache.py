@@ -0,0 +1,192 @@
+"""Версионный кэш страниц со списками постов.
+
+У каждой области (вся лента, группа, автор, пост) есть счетчик версии.
+Версия входит в ключ кэшированного фрагмента, поэтому фрагмент можно
+хранить сколько угодно: сигналы сохранения и удаления постов и
+комментариев увеличивают версию, и следующий запрос просто не найдет
+старый ключ. settings.CACHE_TIMEOUT ограничивает срок жизни сверху.
+
+Там же хранится число постов области для постраничной разбивки: его
+сдвигают те же сигналы, а точный COUNT(*) выполняется, только когда
+значения нет в кэше - не чаще раза в PAGINATOR_COUNT_MAX_AGE секунд.
+Массовые записи в обход сигналов (загрузка, генерация набора данных)
+сбрасывают эти числа через forget_counts().
+"""
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings as s
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from core import routers
+from core.paginators import estimate_count
+
+INDEX_SCOPE = 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def comments_scope(scope):
+    """Число комментариев у постов в списках области scope. HTML-списки
+    его не показывают, поэтому комментарий сдвигает только эту область
+    и не сбрасывает фрагменты страниц; от нее зависят ответы API.
+    """
+    return f'comments:{scope}'
+
+
+def _version_key(scope):
+    return f'scope-version:{scope}'
+
+
+def _initial_version():
+    # Если счетчик вытеснен из кэша, новая версия не должна совпасть
+    # с одной из прежних, поэтому начинаем с текущего времени
+    return int(time.time() * 1000)
+
+
+def get_version(scope):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key, _initial_version())
+    return version
+
+
+def get_versions(scopes):
+    """Версии нескольких областей за одно обращение к кэшу."""
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    return [
+        found[key] if key in found else get_version(scope)
+        for scope, key in zip(scopes, keys)
+    ]
+
+
+def _changed_key(scope):
+    return f'scope-changed:{scope}'
+
+
+def get_changed(scopes):
+    """Время последнего изменения областей (UTC) для Last-Modified.
+
+    Отметку ставит bump(). Если ее нет в кэше, изменением считается
+    текущий момент: лучше отдать ответ целиком, чем устаревший 304.
+    """
+    keys = [_changed_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in found:
+            cache.add(key, now, None)
+    changed = max((found.get(key, now) for key in keys), default=now)
+    return datetime.fromtimestamp(changed, timezone.utc)
+
+
+def bump(*scopes):
+    """Инвалидирует все закэшированные фрагменты указанных областей."""
+    # Отметка времени раньше версии: кто увидел новую версию, увидит
+    # и новое время
+    cache.set_many(
+        {_changed_key(scope): time.time() for scope in scopes}, None
+    )
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def post_scopes(post):
+    """Области, в которых показывается пост."""
+    scopes = [INDEX_SCOPE, author_scope(post.author_id)]
+    if post.group_id is not None:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+def _count_key(scope):
+    return f'post-count:{scope}'
+
+
+def cached_count(scope, queryset):
+    """Число постов области; при промахе - оценка по статистике SQLite
+    (если включен PAGINATOR_ESTIMATE_COUNT и queryset без фильтров) или
+    точный queryset.count().
+
+    Гонки между подсчетом и сдвигом и сама оценка дают расхождение,
+    которое живет не дольше PAGINATOR_COUNT_MAX_AGE: потом число
+    считается заново. Пагинатор уточняет его по выборке страницы.
+    """
+    key = _count_key(scope)
+    count = cache.get(key)
+    if count is None:
+        if s.PAGINATOR_ESTIMATE_COUNT:
+            count = estimate_count(queryset)
+        if count is None:
+            count = queryset.count()
+        cache.add(key, count, s.PAGINATOR_COUNT_MAX_AGE)
+    return count
+
+
+def change_count(scopes, delta):
+    """Сдвигает закэшированные числа постов областей.
+
+    Отсутствующие значения не заводятся: их посчитает первое чтение.
+    """
+    for scope in scopes:
+        try:
+            cache.incr(_count_key(scope), delta)
+        except ValueError:
+            pass
+
+
+def forget_counts(*scopes):
+    """Сбрасывает числа постов областей после записи в обход сигналов."""
+    cache.delete_many([_count_key(scope) for scope in scopes])
+
+
+def count_scopes(post):
+    """Области, для которых хранится число постов. Число постов автора
+    уже есть в AuthorStats.
+    """
+    scopes = [INDEX_SCOPE]
+    if post.group_id is not None:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+def page_cache_context(scope, counted=False):
+    """Переменные шаблона для {% cache %} фрагмента области scope.
+
+    counted - во фрагменте пагинатор с числом из cached_count(): тогда
+    фрагмент живет не дольше самого числа, PAGINATOR_COUNT_MAX_AGE.
+
+    Фрагмент, собранный с реплики, хранится под своим ключом и не
+    дольше REPLICA_PIN_SECONDS: реплика могла еще не получить запись,
+    которая сдвинула версию, и иначе устаревшая страница жила бы под
+    новой версией весь CACHE_TIMEOUT.
+    """
+    alias = routers.read_alias()
+    timeout = s.CACHE_TIMEOUT
+    if counted:
+        timeout = min(timeout, s.PAGINATOR_COUNT_MAX_AGE)
+    if alias != DEFAULT_DB_ALIAS:
+        timeout = min(timeout, s.REPLICA_PIN_SECONDS)
+    return {
+        'cache_timeout': timeout,
+        'cache_version': get_version(scope),
+        'cache_alias': alias,
+    }
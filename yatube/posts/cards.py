@@ -0,0 +1,120 @@
+"""Кэш отрендеренных карточек постов.
+
+Один и тот же пост показывается на главной, в группе, в профайле и в
+ленте подписок, а фрагмент страницы целиком сбрасывается при любом
+новом посте области. Поэтому каждая карточка кэшируется отдельно под
+ключом из id поста и отпечатка всего, что в ней показано: даты
+изменения поста (Post.updated), картинки, имени автора и группы.
+Картинку учитываем отдельно: dedupe_media меняет ее через update(), не
+трогая updated. Страница
+собирает карточки одним get_many и рендерит только недостающие, так
+что работа шаблонов растет с числом новых постов, а не с трафиком.
+
+Недостающие карточки рендерятся пачкой: миниатюры всей пачки
+находятся одним обращением к кэшу и одним запросом к KVStore sorl, а
+ссылки и картинка передаются в шаблон готовыми, без {% url %} и
+тегов миниатюр на каждую карточку. Карточку, у которой миниатюра еще
+готовится, не кэшируем: она показывает заглушку и должна обновиться,
+как только миниатюра появится.
+"""
+import hashlib
+
+from django.conf import settings as s
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from . import thumbnails
+
+CARD_TEMPLATE = 'includes/post_card.html'
+# Миниатюра карточки, один из вариантов thumbnails.VARIANTS
+THUMBNAIL_GEOMETRY = '1200x500'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def card_key(post, profile_link=False):
+    author = post.author
+    group_slug = post.group.slug if post.group_id is not None else ''
+    stamp = '\n'.join((
+        post.updated.isoformat(), post.image.name, author.username,
+        author.get_full_name(), group_slug, str(profile_link),
+    ))
+    digest = hashlib.md5(stamp.encode()).hexdigest()
+    return f'post-card:{post.pk}:{digest}'
+
+
+def _image(post):
+    """Картинка карточки для шаблона и готова ли ее миниатюра."""
+    if not post.image:
+        return None, True
+    thumbnail = thumbnails.resolve(
+        post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS
+    )
+    image = {
+        # Пока миниатюра готовится, показываем заглушку ее размера
+        'url': (thumbnails.placeholder(THUMBNAIL_GEOMETRY)
+                if thumbnail is None else thumbnail.url),
+        'sources': thumbnails.sources(
+            post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS
+        ),
+    }
+    return image, thumbnail is not None
+
+
+def _card_context(post, profile_link):
+    image, ready = _image(post)
+    context = {
+        'post': post,
+        'image': image,
+        'post_url': reverse('posts:post_detail', args=(post.pk,)),
+        'group_url': None,
+        'profile_url': None,
+    }
+    if post.group_id is not None:
+        context['group_url'] = reverse(
+            'posts:group_list', args=(post.group.slug,)
+        )
+    if profile_link:
+        context['profile_url'] = reverse(
+            'posts:profile', args=(post.author.username,)
+        )
+    return context, ready
+
+
+def _render(posts, keys, profile_link):
+    """Рендерит карточки и кэширует те, что уже не изменятся."""
+    if s.THUMBNAIL_PREGENERATE:
+        try:
+            thumbnails.prefetch(
+                [post.image for post in posts],
+                THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS,
+            )
+        except Exception:
+            # Без подсказки resolve() найдет миниатюры сам
+            pass
+    rendered, cacheable = {}, {}
+    for post, key in zip(posts, keys):
+        context, ready = _card_context(post, profile_link)
+        rendered[key] = render_to_string(CARD_TEMPLATE, context)
+        if ready:
+            cacheable[key] = rendered[key]
+    if cacheable:
+        cache.set_many(cacheable, s.CACHE_TIMEOUT)
+    return rendered
+
+
+def render_cards(posts, profile_link=False):
+    """HTML карточек постов в том же порядке.
+
+    profile_link - показывать ли в карточке ссылку на профайл автора.
+    """
+    posts = list(posts)
+    keys = [card_key(post, profile_link) for post in posts]
+    cards = cache.get_many(keys)
+    missing = [
+        (post, key) for post, key in zip(posts, keys) if key not in cards
+    ]
+    if missing:
+        cards.update(_render(*zip(*missing), profile_link))
+    return [mark_safe(cards[key]) for key in keys]
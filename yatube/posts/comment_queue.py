@@ -0,0 +1,230 @@
+"""Буферизованная запись комментариев.
+
+SQLite пропускает одного писателя за раз, и шквал комментариев к
+популярному посту упирается в «database is locked». Если задан
+COMMENT_QUEUE_PATH, add_comment не пишет в основную БД, а дописывает
+комментарий в очередь - отдельный файл SQLite, который не конкурирует
+с основной базой. Фоновый поток (или команда flush_comment_queue)
+переносит очередь пачками через bulk_create и делает то же, что сигналы
+при сохранении комментария: счетчики, поисковый индекс, версии кэша.
+Пока комментарий в очереди, автор видит его на странице поста.
+
+Перенос повторяем: у каждой строки очереди есть случайный token, и
+перенесенный комментарий хранит его в Comment.queue_token. Если процесс
+упал после записи в основную БД, но до удаления строк из очереди,
+следующий перенос пропустит строки, чьи token уже есть в базе.
+Одинаковые комментарии одного автора - это разные строки и разные token.
+"""
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings as s
+from django.db import transaction
+from django.utils import timezone
+
+from . import search
+from .cache import bump, comments_scope, post_scope, post_scopes
+from .counters import change_comment_count
+from .models import Comment, Post
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS pending_comment (
+    id INTEGER PRIMARY KEY,
+    post_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    queued TEXT NOT NULL,
+    token TEXT
+)
+'''
+
+_local = threading.local()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def enabled():
+    return bool(s.COMMENT_QUEUE_PATH)
+
+
+def _connection():
+    """Соединение с файлом очереди, свое у каждого потока."""
+    path = s.COMMENT_QUEUE_PATH
+    connection = getattr(_local, 'connection', None)
+    if connection is None or _local.path != path:
+        # isolation_level=None: транзакциями управляем сами
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(SCHEMA)
+        _add_token(connection)
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS pending_comment_post '
+            'ON pending_comment (post_id, author_id)'
+        )
+        _local.connection, _local.path = connection, path
+    return connection
+
+
+def _add_token(connection):
+    """Добавляет столбец token в очередь, созданную до его появления."""
+    columns = {
+        row[1] for row in connection.execute(
+            'PRAGMA table_info(pending_comment)'
+        )
+    }
+    if 'token' in columns:
+        return
+    connection.execute('ALTER TABLE pending_comment ADD COLUMN token TEXT')
+    connection.execute(
+        'UPDATE pending_comment SET token = lower(hex(randomblob(16))) '
+        'WHERE token IS NULL'
+    )
+
+
+def append(post_id, author, text):
+    """Ставит комментарий в очередь."""
+    _connection().execute(
+        'INSERT INTO pending_comment '
+        '(post_id, author_id, text, queued, token) VALUES (?, ?, ?, ?, ?)',
+        (post_id, author.pk, text, timezone.now().isoformat(),
+         uuid.uuid4().hex),
+    )
+    start_worker()
+
+
+def pending(post_id, author):
+    """Комментарии автора к посту, еще не перенесенные в основную БД,
+    новые сверху - как и в списке комментариев.
+    """
+    rows = _connection().execute(
+        'SELECT text, queued FROM pending_comment '
+        'WHERE post_id = ? AND author_id = ? ORDER BY id DESC',
+        (post_id, author.pk),
+    ).fetchall()
+    return [
+        Comment(post_id=post_id, author=author, text=text,
+                created=datetime.fromisoformat(queued))
+        for text, queued in rows
+    ]
+
+
+def _already_saved(tokens):
+    """token строк очереди, которые уже перенесены в основную БД."""
+    return set(Comment.objects.filter(
+        queue_token__in=tokens
+    ).values_list('queue_token', flat=True))
+
+
+def _save(rows):
+    rows = [
+        (post_id, author_id, text, uuid.UUID(token))
+        for post_id, author_id, text, token in rows
+    ]
+    saved = _already_saved([row[3] for row in rows])
+    comments = [
+        Comment(post_id=post_id, author_id=author_id, text=text,
+                queue_token=token)
+        for post_id, author_id, text, token in rows
+        if token not in saved
+    ]
+    if not comments:
+        return []
+    # Посты, удаленные, пока комментарий ждал в очереди
+    existing = Post.objects.only('author_id', 'group_id').in_bulk(
+        {comment.post_id for comment in comments}
+    )
+    comments = [
+        comment for comment in comments if comment.post_id in existing
+    ]
+    with transaction.atomic():
+        Comment.objects.bulk_create(comments)
+        if comments and comments[0].pk is None:
+            # SQLite не возвращает id из bulk_create. Пока транзакция
+            # держит блокировку записи, новые строки - последние по id
+            ids = Comment.objects.order_by('-id').values_list(
+                'id', flat=True
+            )[:len(comments)]
+            for comment, pk in zip(comments, reversed(ids)):
+                comment.pk = pk
+        for post_id, count in Counter(
+            comment.post_id for comment in comments
+        ).items():
+            change_comment_count(post_id, count)
+        search.add_documents(
+            Comment.objects.none(),
+            Comment.objects.filter(pk__in=[c.pk for c in comments]),
+        )
+    # Как и сигнал: число комментариев видно и в списках постов API
+    scopes = set()
+    for post_id in {comment.post_id for comment in comments}:
+        scopes.update(map(comments_scope, post_scopes(existing[post_id])))
+        scopes.add(post_scope(post_id))
+    bump(*scopes)
+    return comments
+
+
+def flush(batch_size=None):
+    """Переносит очередь в основную БД. Возвращает число перенесенных
+    комментариев.
+
+    Очередь блокируется на время пачки (BEGIN IMMEDIATE), поэтому
+    несколько процессов не перенесут одни и те же строки дважды.
+    """
+    batch_size = batch_size or s.COMMENT_QUEUE_BATCH_SIZE
+    connection = _connection()
+    total = 0
+    while True:
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute(
+                'SELECT id, post_id, author_id, text, token '
+                'FROM pending_comment ORDER BY id LIMIT ?',
+                (batch_size,),
+            ).fetchall()
+            if rows:
+                total += len(_save([row[1:] for row in rows]))
+                connection.execute(
+                    'DELETE FROM pending_comment WHERE id <= ?',
+                    (rows[-1][0],),
+                )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        if len(rows) < batch_size:
+            return total
+
+
+def _run():
+    while True:
+        time.sleep(s.COMMENT_QUEUE_INTERVAL)
+        try:
+            flush()
+        except Exception as error:
+            # Основная БД занята или недоступна: попробуем в следующий раз
+            logger.warning('Не удалось перенести комментарии: %s', error)
+
+
+def start_worker():
+    """Запускает в процессе фоновый поток переноса, если его еще нет.
+
+    При COMMENT_QUEUE_INTERVAL = 0 поток не запускается, и очередь
+    переносит только команда flush_comment_queue.
+    """
+    global _worker
+    if not s.COMMENT_QUEUE_INTERVAL or _worker is not None:
+        return
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(
+                target=_run, name='comment-queue', daemon=True
+            )
+            _worker.start()
@@ -0,0 +1,101 @@
+"""Денормализованные счетчики постов, комментариев и подписок.
+
+Сигналы меняют счетчики атомарными UPDATE ... SET x = x + 1,
+а строка AuthorStats создается лениво при первом чтении с точным
+пересчетом. Так удаление пользователя или массовая вставка в обход
+сигналов не ломают данные: расхождение чинит recount_counters.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from core.queries import exempt
+
+from .models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+def _count_of(model, field):
+    """Подзапрос «сколько строк model ссылается на текущую строку»."""
+    rows = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows), 0)
+
+
+def _shift(queryset, **deltas):
+    queryset.update(**{
+        name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()
+    })
+
+
+def change_author_stats(user_id, **deltas):
+    """Сдвигает счетчики пользователя, если строка уже заведена."""
+    _shift(AuthorStats.objects.filter(user_id=user_id), **deltas)
+
+
+def change_comment_count(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), comment_count=delta)
+
+
+def get_author_stats(user):
+    """Счетчики пользователя; при первом обращении считаются точно."""
+    try:
+        return AuthorStats.objects.get(user=user)
+    except AuthorStats.DoesNotExist:
+        with exempt():
+            recount_authors(User.objects.filter(pk=user.pk))
+            return AuthorStats.objects.get(user=user)
+
+
+def recount_authors(users=None):
+    """Пересчитывает AuthorStats и возвращает число исправленных строк."""
+    if users is None:
+        users = User.objects.all()
+    users = users.annotate(
+        real_posts=_count_of(Post, 'author'),
+        real_followers=_count_of(Follow, 'author'),
+        real_following=_count_of(Follow, 'user'),
+    )
+    existing = dict(
+        (stats.user_id, stats)
+        for stats in AuthorStats.objects.filter(user__in=users.values('pk'))
+    )
+    fixed = 0
+    for user in users.iterator():
+        counts = {
+            'post_count': user.real_posts,
+            'follower_count': user.real_followers,
+            'following_count': user.real_following,
+        }
+        stats = existing.get(user.pk)
+        if stats is not None and all(
+            getattr(stats, name) == value for name, value in counts.items()
+        ):
+            continue
+        fixed += 1
+        try:
+            with transaction.atomic():
+                AuthorStats.objects.update_or_create(
+                    user_id=user.pk, defaults=counts
+                )
+        except IntegrityError:
+            # строку успел завести параллельный запрос
+            AuthorStats.objects.filter(user_id=user.pk).update(**counts)
+    return fixed
+
+
+def recount_comments(posts=None):
+    """Пересчитывает Post.comment_count и возвращает число исправлений."""
+    if posts is None:
+        posts = Post.objects.all()
+    drifted = posts.annotate(
+        real_comments=_count_of(Comment, 'post')
+    ).exclude(comment_count=F('real_comments'))
+    ids = list(drifted.values_list('pk', flat=True))
+    Post.objects.filter(pk__in=ids).update(
+        comment_count=_count_of(Comment, 'post')
+    )
+    return len(ids)
@@ -0,0 +1,63 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Лента пользователя хранится в таблице FeedEntry: пост раскладывается
+по лентам подписчиков в момент публикации, поэтому страница /follow/
+читается одним запросом по индексу (user, -pub_date).
+"""
+from django.conf import settings as s
+
+from .models import FeedEntry, Follow, Post
+
+
+def _entry(user_id, post):
+    return FeedEntry(
+        user_id=user_id,
+        post_id=post.id,
+        author_id=post.author_id,
+        pub_date=post.pub_date,
+    )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (_entry(user_id, post) for user_id in followers.iterator()),
+        batch_size=s.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Переносит в ленту подписчика последние посты автора.
+
+    Берём не больше FEED_BACKFILL_LIMIT постов, чтобы подписка на
+    плодовитого автора не превращалась в вставку десятков тысяч строк.
+    """
+    posts = Post.objects.filter(author_id=author_id).only(
+        'id', 'author_id', 'pub_date'
+    )[:s.FEED_BACKFILL_LIMIT]
+    FeedEntry.objects.bulk_create(
+        (_entry(user_id, post) for post in posts),
+        batch_size=s.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты подписчика все посты автора."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_ids=None):
+    """Перестраивает ленты заново по текущим подпискам."""
+    entries = FeedEntry.objects.all()
+    follows = Follow.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+    entries.delete()
+    for user_id, author_id in follows.values_list('user_id', 'author_id'):
+        backfill(user_id, author_id)
@@ -1,4 +1,10 @@
 from django import forms
+from django.conf import settings as s
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
+
+from core.uploads import (RejectedUpload, normalize_image, read_size,
+                          too_many_pixels)
 
 from .models import Comment, Group, Post
 
@@ -23,10 +29,52 @@ class PostForm(forms.ModelForm):
         required=False
     )
 
+    error_messages = {
+        'too_big': 'Файл больше %(limit)s.',
+        'too_many_pixels': 'Картинка слишком большая: не больше '
+                           '%(limit)s мегапикселей.',
+    }
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файл, отброшенный ImageLimitUploadHandler, не отдаем полю:
+        # причину покажет clean_image()
+        self.rejected_image = None
+        upload = self.files.get('image')
+        if isinstance(upload, RejectedUpload):
+            self.rejected_image = upload
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        """Проверяет лимиты картинки и перекодирует её (normalize_image):
+        в media/posts/ попадает уменьшенный файл без метаданных.
+        """
+        image = self.cleaned_data['image']
+        if self.rejected_image is not None:
+            self._reject('too_big' if self.rejected_image.reason == 'size'
+                         else 'too_many_pixels')
+        if not isinstance(image, UploadedFile):
+            return image
+        size = read_size(image)
+        if size is not None and too_many_pixels(*size):
+            self._reject('too_many_pixels')
+        return normalize_image(image, image.name)
+
+    def _reject(self, code):
+        limits = {
+            'too_big': filesizeformat(s.UPLOAD_IMAGE_MAX_BYTES),
+            'too_many_pixels': s.UPLOAD_IMAGE_MAX_PIXELS // 10 ** 6,
+        }
+        raise forms.ValidationError(
+            self.error_messages[code], code=code,
+            params={'limit': limits[code]},
+        )
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
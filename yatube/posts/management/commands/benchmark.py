@@ -0,0 +1,137 @@
+import json
+import platform
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон страниц постов на сгенерированном наборе '
+        'данных в отдельной тестовой БД. Печатает p50/p95, число запросов '
+        'и пиковую память; умеет сохранять базовую линию в JSON и '
+        'сравнивать с ней.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=10000,
+            help='Размер набора: от 10 тысяч до миллиона постов.',
+        )
+        parser.add_argument(
+            '--users', type=int,
+            help='Число пользователей. По умолчанию - постов / 20.',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Сколько запросов делать на каждый сценарий.',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--scenario', action='append', choices=benchmark.SCENARIOS,
+            help='Прогнать только указанные сценарии.',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять тестовую БД; набор того же размера '
+                 'в следующий раз не генерируется заново.',
+        )
+        parser.add_argument(
+            '--baseline', help='Записать результаты в JSON-файл.',
+        )
+        parser.add_argument(
+            '--compare', help='Сравнить с базовой линией из JSON-файла.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p95 при сравнении, доля (0.2 = 20%%).',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as source:
+                baseline = json.load(source)
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'],
+        )
+        try:
+            report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'],
+            )
+            teardown_test_environment()
+        self.print_report(report['results'])
+        if options['baseline']:
+            with open(options['baseline'], 'w', encoding='utf-8') as target:
+                json.dump(report, target, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Базовая линия: {options["baseline"]}')
+        if baseline is not None:
+            self.check_regressions(report, baseline, options['tolerance'])
+
+    def run(self, options):
+        from posts.models import Post
+
+        if Post.objects.count() == options['posts']:
+            self.stdout.write('Используем набор данных из сохраненной БД')
+            dataset = {'posts': options['posts'], 'seed': options['seed']}
+        else:
+            dataset = benchmark.generate(
+                self.stdout.write, posts=options['posts'],
+                users=options['users'], seed=options['seed'],
+            )
+        cache.clear()
+        runner = benchmark.Runner(
+            requests=options['requests'], cold=options['cold'],
+            seed=options['seed'],
+        )
+        return {
+            'dataset': dataset,
+            'cold': options['cold'],
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'results': runner.run(options['scenario'] or benchmark.SCENARIOS),
+        }
+
+    def print_report(self, results):
+        self.stdout.write(
+            f'{"сценарий":<14}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"запросов":>10}{"память, КБ":>12}'
+        )
+        for scenario, row in results.items():
+            self.stdout.write(
+                f'{scenario:<14}{row["p50_ms"]:>10}{row["p95_ms"]:>10}'
+                f'{row["queries"]:>10}{row["peak_kb"]:>12}'
+            )
+
+    def check_regressions(self, report, baseline, tolerance):
+        if baseline.get('dataset', {}).get('posts') != (
+            report['dataset']['posts']
+        ):
+            self.stdout.write(self.style.WARNING(
+                'Размер набора данных отличается от базовой линии'
+            ))
+        regressions = benchmark.compare(
+            report['results'], baseline['results'], tolerance,
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,92 @@
+import hashlib
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from core.storage import is_hashed_name
+from posts import media
+from posts.cache import bump, post_scope, post_scopes
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, загруженные до хранилища с адресацией '
+        'по содержимому, в posts/<хэш>: одинаковые файлы сливаются в один, '
+        'посты переключаются на общий файл, старые копии и их миниатюры '
+        'удаляются. Затем удаляет файлы, на которые больше не ссылается '
+        'ни один пост (запускайте по расписанию).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько файлов будет объединено '
+                 'и удалено.',
+        )
+        parser.add_argument(
+            '--grace', type=int, default=media.SWEEP_GRACE,
+            help='Не удалять файлы без ссылок, которые менялись меньше '
+                 'указанного числа секунд назад (по умолчанию сутки).',
+        )
+
+    def handle(self, *args, **options):
+        storage = media.image_storage()
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        moved = missing = 0
+        targets = set()
+        for name in names.iterator():
+            if is_hashed_name(name):
+                targets.add(name)
+                continue
+            if not self.exists(storage, name):
+                missing += 1
+                self.stderr.write(f'Файл не найден: {name}')
+                continue
+            if options['dry_run']:
+                digest = self.digest(storage, name)
+                targets.add(storage.hashed_name(name, digest))
+                moved += 1
+                continue
+            with storage.open(name) as source:
+                new_name = storage.save(name, File(source, name))
+            targets.add(new_name)
+            self.relink(name, new_name)
+            media.delete_image(name)
+            moved += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, осталось уникальных: '
+            f'{len(targets)}, не найдено: {missing}'
+        ))
+        removed = media.sweep(options['grace'], options['dry_run'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов без ссылок: {len(removed)}'
+        ))
+
+    def relink(self, name, new_name):
+        posts = Post.objects.filter(image=name)
+        affected = list(posts.only('id', 'author_id', 'group_id'))
+        # Старую копию удаляем сами после переключения: sweep() трогает
+        # только файлы с хэшем в имени
+        posts.update(image=new_name)
+        # Версии сдвигаем после записи: иначе запрос между ними
+        # закэшировал бы старую страницу под новой версией
+        for post in affected:
+            bump(*post_scopes(post), post_scope(post.pk))
+
+    def exists(self, storage, name):
+        try:
+            return storage.exists(name)
+        except SuspiciousFileOperation:
+            # Путь вне MEDIA_ROOT: такой файл не переносим
+            return False
+
+    def digest(self, storage, name):
+        digest = hashlib.sha256()
+        with storage.open(name) as source:
+            for chunk in source.chunks():
+                digest.update(chunk)
+        return digest.hexdigest()
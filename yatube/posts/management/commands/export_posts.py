@@ -0,0 +1,40 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в NDJSON (одна запись JSON на строку) для import_posts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-o', '--output',
+            help='Файл для выгрузки. По умолчанию - стандартный вывод.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из БД за один раз.',
+        )
+
+    def handle(self, *args, **options):
+        output = sys.stdout
+        if options['output']:
+            output = open(options['output'], 'w', encoding='utf-8')
+        written = 0
+        try:
+            for row in transfer.export_rows(options['chunk_size']):
+                output.write(json.dumps(
+                    row, ensure_ascii=False, separators=(',', ':')
+                ))
+                output.write('\n')
+                written += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(f'Выгружено записей: {written - 1}')
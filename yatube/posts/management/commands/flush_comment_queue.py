@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import comment_queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит комментарии из очереди COMMENT_QUEUE_PATH в основную '
+        'БД. С --loop работает постоянно, как отдельный процесс-писатель.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а переносить очередь раз в '
+                 'COMMENT_QUEUE_INTERVAL секунд.',
+        )
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        if not comment_queue.enabled():
+            raise CommandError('Очередь комментариев не настроена: '
+                               'задайте YATUBE_COMMENT_QUEUE.')
+        while True:
+            moved = comment_queue.flush(options['batch_size'])
+            if moved or not options['loop']:
+                self.stdout.write(f'Перенесено комментариев: {moved}')
+            if not options['loop']:
+                return
+            time.sleep(settings.COMMENT_QUEUE_INTERVAL or 1)
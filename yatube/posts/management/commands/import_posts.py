@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_posts пачками через bulk_create. '
+        'При сбое повторный запуск с тем же файлом продолжает загрузку '
+        'с места остановки. Картинки копируются из --media-root; '
+        'миниатюры к ним готовит pregenerate_thumbnails.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON от export_posts.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей вставлять в одной транзакции.',
+        )
+        parser.add_argument(
+            '--state',
+            help='Файл состояния загрузки. По умолчанию - <path>.state.',
+        )
+        parser.add_argument(
+            '--media-root',
+            help='MEDIA_ROOT экземпляра, с которого сделана выгрузка. '
+                 'Без него посты загружаются без картинок.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        state_path = options['state'] or f'{path}.state'
+        importer = transfer.Importer(
+            state_path, options['batch_size'],
+            log=lambda message: self.stdout.write(message),
+            media_root=options['media_root'],
+        )
+        if importer.resumed:
+            self.stdout.write(
+                f'Продолжаем со строки {importer.state["line"] + 1}'
+            )
+        try:
+            with open(path, encoding='utf-8') as lines:
+                importer.run(lines)
+        except transfer.TransferError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
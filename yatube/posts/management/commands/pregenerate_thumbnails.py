@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.cache import bump, post_scope, post_scopes
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает миниатюры для картинок уже опубликованных постов, '
+        'у которых их еще нет.'
+    )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only(
+            'id', 'author_id', 'group_id', 'image'
+        )
+        done = failed = 0
+        for post in posts.iterator():
+            try:
+                thumbnails.generate(post.image.name)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Пост {post.pk}: {error}')
+                continue
+            bump(*post_scopes(post), post_scope(post.pk))
+            done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано постов: {done}, с ошибками: {failed}'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает поисковый индекс постов и комментариев. Нужна после '
+        'массовой загрузки данных в обход сигналов (bulk_create, update).'
+    )
+
+    def handle(self, *args, **options):
+        index = search.get_index()
+        documents = search.rebuild(index)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано документов: {documents} '
+            f'(индекс: {index.name})'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счетчики постов, комментариев '
+        'и подписок и исправляет найденные расхождения.'
+    )
+
+    def handle(self, *args, **options):
+        authors = counters.recount_authors()
+        posts = counters.recount_comments()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков пользователей: {authors}, '
+            f'счетчиков комментариев: {posts}'
+        ))
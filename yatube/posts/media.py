@@ -0,0 +1,94 @@
+"""Учет ссылок на картинки постов.
+
+Картинки хранятся в ContentAddressedStorage, и один файл может
+принадлежать нескольким постам. Ссылки считаются по самой таблице
+постов (индекс по Post.image). Удалять файл сразу после удаления поста
+нельзя: параллельная загрузка той же картинки уже могла сохранить
+файл, но еще не закоммитила свой пост. Поэтому файлы удаляет только
+sweep() (его вызывает команда dedupe_media): файл без ссылок уходит
+вместе с миниатюрами, если его не трогали дольше grace. Хранилище
+обновляет время изменения файла при каждой повторной загрузке.
+"""
+import datetime
+import posixpath
+
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from core.storage import is_hashed_name
+
+from .models import Post
+
+IMAGE_DIR = Post._meta.get_field('image').upload_to.rstrip('/')
+SWEEP_BATCH = 500
+# Загрузка, которая переиспользовала файл, коммитит свой пост
+# гораздо быстрее
+SWEEP_GRACE = 24 * 60 * 60
+
+
+def image_storage():
+    return Post._meta.get_field('image').storage
+
+
+def delete_image(name):
+    """Удаляет файл картинки и все её миниатюры."""
+    image = ImageFile(name, image_storage())
+    default.kvstore.delete(image)
+    image_storage().delete(name)
+
+
+def _hashed_names(storage, directory):
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        name = posixpath.join(directory, name)
+        if is_hashed_name(name):
+            yield name
+    for subdirectory in directories:
+        yield from _hashed_names(
+            storage, posixpath.join(directory, subdirectory)
+        )
+
+
+def _stale(storage, name, deadline):
+    try:
+        return storage.get_modified_time(name) < deadline
+    except FileNotFoundError:
+        return False
+
+
+def _collect(storage, names, deadline, dry_run):
+    referenced = set(Post.objects.filter(image__in=names).values_list(
+        'image', flat=True
+    ))
+    removed = []
+    for name in names:
+        if name in referenced:
+            continue
+        if dry_run:
+            removed.append(name)
+        # Файл, загруженный заново после выборки, уже не устаревший
+        elif _stale(storage, name, deadline):
+            delete_image(name)
+            removed.append(name)
+    return removed
+
+
+def sweep(grace, dry_run=False):
+    """Удаляет файлы картинок, на которые не ссылается ни один пост и
+    которые не менялись дольше grace секунд. Возвращает их имена.
+    """
+    storage = image_storage()
+    deadline = timezone.now() - datetime.timedelta(seconds=grace)
+    removed, batch = [], []
+    for name in _hashed_names(storage, IMAGE_DIR):
+        if _stale(storage, name, deadline):
+            batch.append(name)
+        if len(batch) == SWEEP_BATCH:
+            removed += _collect(storage, batch, deadline, dry_run)
+            batch = []
+    if batch:
+        removed += _collect(storage, batch, deadline, dry_run)
+    return removed
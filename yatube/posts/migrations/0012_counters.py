@@ -0,0 +1,63 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    for post in Post.objects.annotate(total=Count('comments')).filter(
+        total__gt=0
+    ):
+        Post.objects.filter(pk=post.pk).update(comment_count=post.total)
+    stats = {}
+
+    def counters_of(user_id):
+        return stats.setdefault(user_id, {
+            'post_count': 0, 'follower_count': 0, 'following_count': 0,
+        })
+
+    for row in Post.objects.order_by().values('author').annotate(total=Count('pk')):
+        counters_of(row['author'])['post_count'] = row['total']
+    for row in Follow.objects.values('author').annotate(total=Count('pk')):
+        counters_of(row['author'])['follower_count'] = row['total']
+    for row in Follow.objects.values('user').annotate(total=Count('pk')):
+        counters_of(row['user'])['following_count'] = row['total']
+    AuthorStats.objects.bulk_create(
+        AuthorStats(user_id=user_id, **counts)
+        for user_id, counts in stats.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('follower_count', models.PositiveIntegerField(default=0, verbose_name='Число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Число подписок')),
+            ],
+            options={
+                'verbose_name': 'Счетчики пользователя',
+                'verbose_name_plural': 'Счетчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
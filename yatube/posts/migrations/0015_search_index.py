@@ -0,0 +1,116 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:47
+
+from collections import Counter
+
+from django.db import migrations, models, utils
+import django.db.models.deletion
+
+from core.stemmer import tokenize
+
+# Копия нужного из posts/search.py на момент миграции: модуль поиска
+# работает с django.db.connection и текущими моделями
+FTS_TABLE = 'posts_search_fts'
+K1 = 1.2
+B = 0.75
+AVERAGE_LENGTH = 40
+MAX_TERM_LENGTH = 64
+BATCH_SIZE = 500
+
+
+def terms_of(text):
+    return [term for term in tokenize(text or '')
+            if len(term) <= MAX_TERM_LENGTH]
+
+
+def weights(text):
+    terms = terms_of(text)
+    length = len(terms) / AVERAGE_LENGTH
+    return {
+        term: tf * (K1 + 1) / (tf + K1 * (1 - B + B * length))
+        for term, tf in Counter(terms).items()
+    }
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} '
+            'USING fts5(body, post_id UNINDEXED)'
+        )
+    except utils.OperationalError:
+        # SQLite собран без FTS5: будет использоваться таблица SearchPosting
+        pass
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def documents(apps, using):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    posts = Post.objects.using(using).values_list('id', 'text')
+    for post_id, text in posts.iterator():
+        yield post_id, None, text
+    yield from Comment.objects.using(using).values_list(
+        'post_id', 'id', 'text'
+    ).iterator()
+
+
+def fill_index(apps, schema_editor):
+    connection = schema_editor.connection
+    using = connection.alias
+    if (connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()):
+        with connection.cursor() as cursor:
+            for post_id, comment_id, text in documents(apps, using):
+                # Четные rowid у постов, нечетные у комментариев
+                rowid = (post_id * 2 if comment_id is None
+                         else comment_id * 2 + 1)
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, body, post_id) '
+                    'VALUES (%s, %s, %s)',
+                    [rowid, ' '.join(terms_of(text)), post_id],
+                )
+        return
+    SearchPosting = apps.get_model('posts', 'SearchPosting')
+    SearchPosting.objects.using(using).bulk_create(
+        (SearchPosting(term=term, post_id=post_id, comment_id=comment_id,
+                       weight=weight)
+         for post_id, comment_id, text in documents(apps, using)
+         for term, weight in weights(text).items()),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('weight', models.FloatField(verbose_name='Вес термина')),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Comment', verbose_name='Комментарий')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', 'post'], name='search_term_post_idx'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
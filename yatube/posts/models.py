@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models.fields.related import ForeignKey
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -19,9 +21,37 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # Поля, которые нужны карточке поста в списках:
+    # автор и группа подтягиваются тем же запросом через JOIN,
+    # а неиспользуемые колонки (пароль автора, описание группы) не читаются
+    LISTING_FIELDS = (
+        'text',
+        'pub_date',
+        'updated',
+        'image',
+        'author',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group',
+        'group__title',
+        'group__slug',
+        'comment_count',
+    )
+
+    def for_listing(self):
+        """Посты для постраничных списков: один запрос на страницу."""
+        return self.select_related('author', 'group').only(
+            *self.LISTING_FIELDS
+        )
+
+
 class Post(models.Model):
     text = models.TextField('Текст поста', help_text='Текст нового поста')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    # Меняется при каждом save(): входит в ключ кэша карточки поста
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -40,13 +70,34 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        blank=True,
+        # Одинаковые картинки хранятся одним файлом (см. posts/media.py),
+        # индекс нужен для подсчета ссылок на файл
+        storage=ContentAddressedStorage(),
+        db_index=True,
+    )
+    comment_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты авторов'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date'),
+                name='post_group_pub_date_idx',
+            ),
+        )
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -70,11 +121,21 @@ class Comment(models.Model):
         related_name='comments',
         verbose_name='Ссылка на автора комментария'
     )
+    # Строка очереди comment_queue, из которой пришел комментарий:
+    # по ней повторный перенос узнает уже сохраненные
+    queue_token = models.UUIDField(null=True, unique=True, editable=False)
 
     class Meta:
         verbose_name = 'Комментарий автора'
         verbose_name_plural = 'Комментарии авторов'
         ordering = ('-created',)
+        indexes = (
+            # Порции комментариев к посту по ключу (created, id)
+            models.Index(
+                fields=('post', 'created', 'id'),
+                name='comment_post_created_idx',
+            ),
+        )
 
     def __str__(self) -> str:
         return (
@@ -102,9 +163,133 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка на автора'
         verbose_name_plural = 'Подписки на авторов'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow',
+            ),
+        )
 
     def __str__(self) -> str:
         return (
             f'Пользователь {self.user.username}'
             f' подписан на автора {self.author.username}'
         )
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счетчики пользователя.
+
+    Обновляются атомарно (F-выражениями) при создании и удалении
+    постов и подписок, чтобы профайл и страница поста не считали
+    COUNT(*) на каждый запрос. Расхождения чинит команда recount_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    post_count = models.PositiveIntegerField('Число постов', default=0)
+    follower_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок', default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+    def __str__(self) -> str:
+        return f'Счетчики пользователя {self.user_id}'
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя.
+
+    Строки создаются при публикации поста для всех подписчиков автора
+    и при подписке на автора, а удаляются при отписке.
+    Дата публикации и автор продублированы из поста,
+    чтобы страница ленты читалась по одному индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель ленты',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста',
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+        ordering = ('-pub_date',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_feed_entry',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date'),
+                name='feed_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'Пост {self.post_id} в ленте пользователя {self.user_id}'
+
+
+class SearchPosting(models.Model):
+    """Запись инвертированного индекса для поиска без FTS5.
+
+    Одна строка - одна основа слова (см. core/stemmer.py) в тексте поста
+    или комментария. В weight заранее посчитан вклад термина в BM25 с
+    учетом длины документа; при запросе остается умножить его на IDF.
+    """
+    term = models.CharField('Основа слова', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Комментарий',
+    )
+    weight = models.FloatField('Вес термина')
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+        indexes = (
+            models.Index(fields=('term', 'post'), name='search_term_post_idx'),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.term} в посте {self.post_id}'
@@ -0,0 +1,318 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Текст разбивается на слова и приводится к основам русским стеммером
+(core/stemmer.py), поэтому запрос «котами» находит пост про «кота».
+Документ индекса - пост или комментарий. Все слова запроса должны
+встретиться в одном документе; в выдачу попадают посты, отсортированные
+по лучшему из своих документов.
+
+Индекс хранится одним из двух способов:
+
+* fts5 - виртуальная таблица SQLite FTS5 со стеммированным текстом,
+  ранжирование встроенной функцией bm25();
+* table - таблица SearchPosting (терм, пост, комментарий, вес), BM25
+  считается агрегатным запросом. Работает на любой СУБД.
+
+По умолчанию (SEARCH_BACKEND = 'auto') используется FTS5, если таблица
+для него создана миграцией. Индекс обновляется сигналами сохранения и
+удаления постов и комментариев, полностью его пересобирает команда
+rebuild_search_index.
+"""
+import math
+from collections import Counter
+from itertools import chain, islice
+
+from django.conf import settings as s
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models import (Case, Count, ExpressionWrapper, F, FloatField,
+                              Sum, Value, When)
+
+from core.stemmer import tokenize
+
+from .models import Comment, Post, SearchPosting
+
+FTS_TABLE = 'posts_search_fts'
+# Параметры BM25
+K1 = 1.2
+B = 0.75
+MAX_TERM_LENGTH = 64
+
+
+def terms_of(text):
+    return [term for term in tokenize(text or '')
+            if len(term) <= MAX_TERM_LENGTH]
+
+
+def weights(text):
+    """Вклад каждого термина текста в BM25 (без множителя IDF)."""
+    terms = terms_of(text)
+    length = len(terms) / s.SEARCH_AVERAGE_LENGTH
+    return {
+        term: tf * (K1 + 1) / (tf + K1 * (1 - B + B * length))
+        for term, tf in Counter(terms).items()
+    }
+
+
+_fts_connections = set()
+
+
+def fts_available(using=connection):
+    # Наличие таблицы проверяем один раз на соединение с БД
+    if using.alias in _fts_connections:
+        return True
+    if (using.vendor == 'sqlite'
+            and FTS_TABLE in using.introspection.table_names()):
+        _fts_connections.add(using.alias)
+        return True
+    return False
+
+
+def _rowid(post_id, comment_id):
+    # Посты и комментарии в одной таблице: четные rowid у постов
+    if comment_id is None:
+        return post_id * 2
+    return comment_id * 2 + 1
+
+
+class Fts5Index:
+    name = 'fts5'
+
+    def add(self, post_id, comment_id, text):
+        self.remove(post_id, comment_id)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body, post_id) '
+                'VALUES (%s, %s, %s)',
+                [_rowid(post_id, comment_id), ' '.join(terms_of(text)),
+                 post_id],
+            )
+
+    def add_many(self, documents):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, body, post_id) '
+                'VALUES (%s, %s, %s)',
+                [(_rowid(post_id, comment_id), ' '.join(terms_of(text)),
+                  post_id) for post_id, comment_id, text in documents],
+            )
+
+    def remove(self, post_id, comment_id=None):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [_rowid(post_id, comment_id)])
+
+    def remove_after(self, post_id):
+        """Удаляет документы постов с id больше post_id."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE post_id > %s',
+                           [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def _match(self, terms):
+        # Термины состоят только из букв и цифр, кавычки нужны, чтобы
+        # слова вроде «or» или «not» не считались операторами запроса
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def count(self, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(DISTINCT post_id) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self._match(terms)],
+            )
+            return cursor.fetchone()[0]
+
+    def post_ids(self, terms, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id, MIN(rank) AS score FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s GROUP BY post_id '
+                'ORDER BY score, post_id DESC LIMIT %s OFFSET %s',
+                [self._match(terms), limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class TableIndex:
+    name = 'table'
+
+    def __init__(self, posting_model=SearchPosting):
+        self.model = posting_model
+
+    def add(self, post_id, comment_id, text):
+        self.remove(post_id, comment_id)
+        self.model.objects.bulk_create(
+            self.model(term=term, post_id=post_id, comment_id=comment_id,
+                       weight=weight)
+            for term, weight in weights(text).items()
+        )
+
+    def add_many(self, documents):
+        self.model.objects.bulk_create(
+            (self.model(term=term, post_id=post_id, comment_id=comment_id,
+                        weight=weight)
+             for post_id, comment_id, text in documents
+             for term, weight in weights(text).items()),
+            batch_size=s.SEARCH_BATCH_SIZE,
+        )
+
+    def remove(self, post_id, comment_id=None):
+        self.model.objects.filter(
+            post_id=post_id, comment_id=comment_id
+        ).delete()
+
+    def remove_after(self, post_id):
+        """Удаляет документы постов с id больше post_id."""
+        self.model.objects.filter(post_id__gt=post_id).delete()
+
+    def clear(self):
+        self.model.objects.all().delete()
+
+    def _documents(self, terms):
+        """Документы (пост или комментарий), где есть все термины."""
+        return self.model.objects.filter(term__in=terms).order_by().values(
+            'post_id', 'comment_id'
+        ).annotate(
+            matched=Count('term', distinct=True)
+        ).filter(matched=len(terms))
+
+    def count(self, terms):
+        return self._documents(terms).values('post_id').distinct().count()
+
+    def _idf(self, terms):
+        total = _document_count()
+        frequencies = dict(
+            self.model.objects.filter(term__in=terms).order_by().values(
+                'term'
+            ).annotate(df=Count('id')).values_list('term', 'df')
+        )
+        return {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in frequencies.items()
+        }
+
+    def post_ids(self, terms, offset, limit):
+        idf = self._idf(terms)
+        if not idf:
+            return []
+        score = Sum(ExpressionWrapper(
+            F('weight') * Case(
+                *(When(term=term, then=Value(value))
+                  for term, value in idf.items()),
+                output_field=FloatField(),
+            ),
+            output_field=FloatField(),
+        ))
+        # Как и у FTS5, пост ранжируется по лучшему из своих документов
+        documents = self._documents(terms).annotate(score=score).values(
+            'post_id', 'score'
+        )
+        sql, params = documents.query.sql_with_params()
+        with connections[documents.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id, MAX(score) AS best FROM ({sql}) documents '
+                'GROUP BY post_id ORDER BY best DESC, post_id DESC '
+                'LIMIT %s OFFSET %s',
+                [*params, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def _document_count():
+    # Для IDF достаточно приблизительного числа документов
+    total = cache.get('search:documents')
+    if total is None:
+        total = Post.objects.count() + Comment.objects.count()
+        cache.set('search:documents', total, s.SEARCH_STATS_TIMEOUT)
+    return max(total, 1)
+
+
+def get_index():
+    backend = s.SEARCH_BACKEND
+    if backend == 'auto':
+        backend = 'fts5' if fts_available() else 'table'
+    return Fts5Index() if backend == 'fts5' else TableIndex()
+
+
+def index_post(post):
+    get_index().add(post.pk, None, post.text)
+
+
+def index_comment(comment):
+    get_index().add(comment.post_id, comment.pk, comment.text)
+
+
+def remove_post(post_id):
+    get_index().remove(post_id)
+
+
+def remove_comment(comment):
+    get_index().remove(comment.post_id, comment.pk)
+
+
+def add_documents(posts, comments, index=None):
+    """Индексирует посты и комментарии из querysets пачками.
+
+    Документы должны отсутствовать в индексе: так индексируются строки,
+    загруженные в обход сигналов (см. команду import_posts).
+    """
+    index = index or get_index()
+    posts = posts.order_by().values_list('id', 'text')
+    comments = comments.order_by().values_list('post_id', 'id', 'text')
+    rows = chain(
+        ((post_id, None, text) for post_id, text in posts.iterator()),
+        comments.iterator(),
+    )
+    documents = 0
+    while True:
+        batch = list(islice(rows, s.SEARCH_BATCH_SIZE))
+        if not batch:
+            break
+        index.add_many(batch)
+        documents += len(batch)
+    return documents
+
+
+def rebuild(index=None, post_model=Post, comment_model=Comment):
+    """Заново индексирует все посты и комментарии.
+
+    Модели передаются явно, чтобы функцию можно было вызвать из миграции
+    с историческими моделями.
+    """
+    index = index or get_index()
+    with transaction.atomic():
+        index.clear()
+        return add_documents(
+            post_model.objects.all(), comment_model.objects.all(), index
+        )
+
+
+class SearchResults:
+    """Результаты поиска для Paginator: count() и срезы по страницам."""
+    def __init__(self, query, index=None):
+        self.terms = sorted(set(terms_of(query)))
+        self.index = index or get_index()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.index.count(self.terms) if self.terms else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError('Результаты поиска поддерживают только срезы')
+        if not self.terms:
+            return []
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+        ids = self.index.post_ids(self.terms, start, max(stop - start, 0))
+        posts = Post.objects.for_listing().in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
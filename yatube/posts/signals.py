@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, counters, feed, search
+from .models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_pre_save(sender, instance, raw=False, **kwargs):
+    # При смене группы нужно сбросить кэш и у прежней группы
+    instance._previous_group_id = None
+    if instance.pk is not None and not raw:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if created:
+        counters.change_author_stats(instance.author_id, post_count=1)
+        cache.change_count(cache.count_scopes(instance), 1)
+        feed.fan_out(instance)
+    elif previous_group_id != instance.group_id:
+        if previous_group_id is not None:
+            cache.change_count([cache.group_scope(previous_group_id)], -1)
+        if instance.group_id is not None:
+            cache.change_count([cache.group_scope(instance.group_id)], 1)
+    search.index_post(instance)
+    scopes = cache.post_scopes(instance)
+    if previous_group_id not in (None, instance.group_id):
+        scopes.append(cache.group_scope(previous_group_id))
+    cache.bump(*scopes, cache.post_scope(instance.pk))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_author_stats(instance.author_id, post_count=-1)
+    cache.change_count(cache.count_scopes(instance), -1)
+    search.remove_post(instance.pk)
+    cache.bump(*cache.post_scopes(instance), cache.post_scope(instance.pk))
+
+
+def comment_scopes(comment):
+    # Списки постов в API показывают comment_count, поэтому комментарий
+    # меняет и их, но не HTML-страницы списков
+    if Comment._meta.get_field('post').is_cached(comment):
+        post = comment.post
+    else:
+        post = Post.objects.only('author_id', 'group_id').filter(
+            pk=comment.post_id
+        ).first()
+    if post is None:
+        # Пост удаляется вместе с комментариями и сбросит списки сам
+        return [cache.post_scope(comment.post_id)]
+    return [
+        *map(cache.comments_scope, cache.post_scopes(post)),
+        cache.post_scope(post.pk),
+    ]
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_comment_count(instance.post_id, 1)
+    search.index_comment(instance)
+    cache.bump(*comment_scopes(instance))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comment_count(instance.post_id, -1)
+    search.remove_comment(instance)
+    cache.bump(*comment_scopes(instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_author_stats(instance.author_id, follower_count=1)
+        counters.change_author_stats(instance.user_id, following_count=1)
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_author_stats(instance.author_id, follower_count=-1)
+    counters.change_author_stats(instance.user_id, following_count=-1)
+    feed.prune(instance.user_id, instance.author_id)
@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.test import TestCase
+from posts import benchmark
+from posts.models import AuthorStats, FeedEntry, Follow, Post
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dataset = benchmark.generate(
+            lambda message: None, posts=60, users=12, groups=3,
+            follows_per_user=4, batch_size=25,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_dataset(self):
+        """Набор данных создан вместе с производными таблицами."""
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertTrue(Follow.objects.exists())
+        expected = sum(
+            AuthorStats.objects.get(user_id=author_id).post_count
+            for author_id in Follow.objects.values_list('author_id',
+                                                        flat=True)
+        )
+        self.assertEqual(FeedEntry.objects.count(), expected)
+        # Степенной закон: у самого активного автора заметная доля постов
+        top = AuthorStats.objects.order_by('-post_count').first()
+        self.assertGreater(top.post_count, 60 / 12)
+
+    def test_run(self):
+        """Каждый сценарий возвращает метрики без ошибочных ответов."""
+        results = benchmark.Runner(requests=3).run()
+        self.assertEqual(tuple(results), benchmark.SCENARIOS)
+        for scenario, row in results.items():
+            with self.subTest(scenario=scenario):
+                self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+                self.assertGreater(row['queries'], 0)
+                self.assertGreater(row['peak_kb'], 0)
+
+    def test_compare(self):
+        """Сравнение ловит рост p95 сверх допуска и лишние запросы."""
+        baseline = {'index': {'p95_ms': 10, 'queries': 2}}
+        self.assertEqual(benchmark.compare(
+            {'index': {'p95_ms': 11.5, 'queries': 2}}, baseline
+        ), [])
+        regressions = benchmark.compare(
+            {'index': {'p95_ms': 13, 'queries': 3}}, baseline
+        )
+        self.assertEqual(len(regressions), 2)
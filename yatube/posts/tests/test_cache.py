@@ -0,0 +1,171 @@
+from django.core.cache import cache
+from django.db import connection
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from posts.cache import (INDEX_SCOPE, cached_count, forget_counts,
+                         group_scope, page_cache_context)
+from posts.models import Comment, Group, Post, User
+
+GROUP_ONE_PAGE: str = '/group/sdwan/'
+GROUP_TWO_PAGE: str = '/group/nfvo/'
+
+
+class VersionedPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='leo')
+        cls.group_one = Group.objects.create(
+            title='SD-WAN', slug='sdwan', description='-'
+        )
+        cls.group_two = Group.objects.create(
+            title='NFVO', slug='nfvo', description='-'
+        )
+        cls.post = Post.objects.create(
+            text='Пост, который переезжает между группами',
+            author=cls.user,
+            group=cls.group_one,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_moving_post_invalidates_both_groups(self):
+        """Смена группы поста сбрасывает кэш старой и новой группы."""
+        post = VersionedPageCacheTest.post
+        self.assertContains(self.guest_client.get(GROUP_ONE_PAGE), post.text)
+        self.assertNotContains(
+            self.guest_client.get(GROUP_TWO_PAGE), post.text
+        )
+        post.group = VersionedPageCacheTest.group_two
+        post.save()
+        self.assertNotContains(
+            self.guest_client.get(GROUP_ONE_PAGE), post.text
+        )
+        self.assertContains(self.guest_client.get(GROUP_TWO_PAGE), post.text)
+
+    def test_deleted_post_disappears_from_profile(self):
+        """Удаленный пост сразу пропадает из кэшированного профайла."""
+        post = Post.objects.create(text='Пост на удаление', author=self.user)
+        profile_page = f'/profile/{VersionedPageCacheTest.user.username}/'
+        self.assertContains(self.guest_client.get(profile_page), post.text)
+        post.delete()
+        self.assertNotContains(self.guest_client.get(profile_page), post.text)
+
+    def test_new_comment_invalidates_post_comments(self):
+        """Новый комментарий виден на странице поста сразу."""
+        post_page = f'/posts/{VersionedPageCacheTest.post.id}/'
+        self.guest_client.get(post_page)
+        Comment.objects.create(
+            text='Свежий комментарий',
+            post=VersionedPageCacheTest.post,
+            author=VersionedPageCacheTest.user,
+        )
+        self.assertContains(
+            self.guest_client.get(post_page), 'Свежий комментарий'
+        )
+
+
+class CachedCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='leo')
+        cls.group_one = Group.objects.create(
+            title='SD-WAN', slug='sdwan', description='-'
+        )
+        cls.group_two = Group.objects.create(
+            title='NFVO', slug='nfvo', description='-'
+        )
+        Post.objects.create(text='Первый', author=cls.user,
+                            group=cls.group_one)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def counts(self):
+        group_one = CachedCountTest.group_one
+        group_two = CachedCountTest.group_two
+        return (
+            cached_count(INDEX_SCOPE, Post.objects.all()),
+            cached_count(group_scope(group_one.id), group_one.group_posts),
+            cached_count(group_scope(group_two.id), group_two.group_posts),
+        )
+
+    def test_signals_keep_counts_without_recounting(self):
+        """Создание, перенос и удаление поста сдвигают закэшированные
+        числа, и повторного COUNT(*) не требуется.
+        """
+        self.assertEqual(self.counts(), (1, 1, 0))
+        with CaptureQueriesContext(connection) as queries:
+            post = Post.objects.create(
+                text='Второй', author=self.user, group=self.group_one
+            )
+            self.assertEqual(self.counts(), (2, 2, 0))
+            post.group = CachedCountTest.group_two
+            post.save()
+            self.assertEqual(self.counts(), (2, 1, 1))
+            post.delete()
+            self.assertEqual(self.counts(), (1, 1, 0))
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+
+    def test_forget_counts(self):
+        """После записи в обход сигналов числа считаются заново."""
+        self.assertEqual(self.counts(), (1, 1, 0))
+        Post.objects.bulk_create([
+            Post(text='Пачкой', author=self.user, group=self.group_two)
+        ])
+        self.assertEqual(self.counts(), (1, 1, 0))
+        forget_counts(INDEX_SCOPE, group_scope(self.group_two.id))
+        self.assertEqual(self.counts(), (2, 1, 1))
+
+    @override_settings(PAGINATOR_ESTIMATE_COUNT=True)
+    def test_estimate_on_cache_miss(self):
+        """С PAGINATOR_ESTIMATE_COUNT главная при промахе кэша берет
+        число постов из статистики SQLite, а не из COUNT(*).
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest('Оценка только для SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get('/')
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+
+    def test_fragment_lives_no_longer_than_count(self):
+        """Фрагмент с пагинатором живет не дольше числа постов."""
+        timeout = page_cache_context(INDEX_SCOPE, counted=True)[
+            'cache_timeout'
+        ]
+        self.assertEqual(timeout, min(settings.CACHE_TIMEOUT,
+                                      settings.PAGINATOR_COUNT_MAX_AGE))
+
+    def test_index_reads_count_from_cache(self):
+        """Повторный запрос главной не считает COUNT(*)."""
+        self.guest_client.get('/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get('/?page=1')
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+
+    def test_warm_pages_do_not_select_posts(self):
+        """Пока фрагмент страницы в кэше, посты из БД не выбираются."""
+        pages = ('/', GROUP_ONE_PAGE, f'/profile/{self.user.username}/')
+        for page in pages:
+            with self.subTest(page=page):
+                self.guest_client.get(page)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(page)
+                self.assertContains(response, 'Первый')
+                for query in queries.captured_queries:
+                    self.assertNotIn('FROM "posts_post"', query['sql'])
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from posts import cards
+from posts.models import Group, Post, User
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='leo', first_name='Лев')
+        cls.group = Group.objects.create(
+            title='SD-WAN', slug='sdwan', description='-'
+        )
+        cls.post = Post.objects.create(
+            text='Карточка из кэша', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def listing(self):
+        return list(Post.objects.for_listing().order_by('-pub_date'))
+
+    def test_cached_cards_are_not_rendered_again(self):
+        """Повторная страница берет карточки из кэша без рендера."""
+        first = cards.render_cards(self.listing())
+        with mock.patch.object(cards, 'render_to_string') as render:
+            second = cards.render_cards(self.listing())
+        render.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertIn('Карточка из кэша', second[0])
+
+    def test_card_key_follows_post_and_author(self):
+        """Правка поста или имени автора дает карточке новый ключ."""
+        key = cards.card_key(self.listing()[0])
+        post = PostCardCacheTest.post
+        post.text = 'Исправленный текст'
+        post.save()
+        edited = cards.card_key(self.listing()[0])
+        self.assertNotEqual(key, edited)
+        user = PostCardCacheTest.user
+        user.first_name = 'Лео'
+        user.save()
+        self.assertNotEqual(edited, cards.card_key(self.listing()[0]))
+        self.assertNotEqual(
+            edited, cards.card_key(self.listing()[0], profile_link=True)
+        )
+        self.assertContains(self.guest_client.get('/'), 'Исправленный текст')
+
+    def test_card_key_follows_image(self):
+        """Замена картинки через update(), как в dedupe_media, тоже дает
+        карточке новый ключ.
+        """
+        key = cards.card_key(self.listing()[0])
+        Post.objects.filter(pk=PostCardCacheTest.post.pk).update(
+            image='posts/moved.gif'
+        )
+        self.assertNotEqual(key, cards.card_key(self.listing()[0]))
+
+    def test_card_with_pending_thumbnail_is_not_cached(self):
+        """Карточка, у которой миниатюра еще готовится, показывает
+        заглушку и не кэшируется.
+        """
+        posts = self.listing()
+        posts[0].image.name = 'posts/pending.gif'
+        with mock.patch.object(cards.thumbnails, 'resolve',
+                               return_value=None):
+            with mock.patch.object(cards.thumbnails, 'sources',
+                                   return_value=[]):
+                card, = cards.render_cards(posts)
+        self.assertIn(cards.thumbnails.placeholder('1200x500'), card)
+        self.assertIsNone(cache.get(cards.card_key(posts[0])))
+
+    def test_links_are_precomputed(self):
+        """Ссылки карточки готовятся заранее и ведут куда нужно."""
+        post = self.listing()[0]
+        card, = cards.render_cards([post], profile_link=True)
+        self.assertIn(f'href="/posts/{post.id}/"', card)
+        self.assertIn('href="/group/sdwan/"', card)
+        self.assertIn('href="/profile/leo/"', card)
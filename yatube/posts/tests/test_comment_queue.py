@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import comment_queue, search
+from posts.models import Comment, Post, User
+
+QUEUE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(COMMENT_QUEUE_PATH=os.path.join(QUEUE_DIR, 'queue.db'),
+                   COMMENT_QUEUE_INTERVAL=0)
+class CommentQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.post = Post.objects.create(text='Горячий пост', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(QUEUE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        comment_queue._connection().execute('DELETE FROM pending_comment')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def comment(self, text):
+        return self.client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': text},
+        )
+
+    def test_comment_is_queued(self):
+        """Комментарий ждет в очереди, но его автор уже видит его."""
+        self.comment('Из очереди')
+        self.assertFalse(Comment.objects.exists())
+        detail = reverse('posts:post_detail', args=(self.post.id,))
+        self.assertContains(self.client.get(detail), 'Из очереди')
+        self.assertNotContains(Client().get(detail), 'Из очереди')
+
+    def test_flush(self):
+        """Перенос сохраняет комментарии и делает работу сигналов."""
+        for i in range(3):
+            self.comment(f'Пачка {i}')
+        call_command('flush_comment_queue', batch_size=2,
+                     stdout=open(os.devnull, 'w'))
+        texts = Comment.objects.order_by('id').values_list('text',
+                                                           flat=True)
+        self.assertEqual(list(texts), ['Пачка 0', 'Пачка 1', 'Пачка 2'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+        self.assertEqual(search.SearchResults('пачка').count(), 1)
+        self.assertEqual(comment_queue.pending(self.post.id, self.reader),
+                         [])
+        response = Client().get(
+            reverse('posts:post_detail', args=(self.post.id,))
+        )
+        self.assertContains(response, 'Пачка 2')
+
+    def test_flush_is_repeatable(self):
+        """Если очередь не очистилась после записи, дублей не будет."""
+        self.comment('Ровно один раз')
+        original = comment_queue._save
+
+        def crash(rows):
+            original(rows)
+            raise RuntimeError('процесс упал')
+
+        with mock.patch.object(comment_queue, '_save', crash):
+            with self.assertRaises(RuntimeError):
+                comment_queue.flush()
+        self.assertEqual(comment_queue.flush(), 0)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_identical_comments_in_different_batches(self):
+        """Одинаковые комментарии одного автора в разных пачках
+        переносятся все.
+        """
+        self.comment('+1')
+        self.comment('+1')
+        self.assertEqual(comment_queue.flush(batch_size=1), 2)
+        self.assertEqual(Comment.objects.filter(text='+1').count(), 2)
+
+    def test_comment_to_deleted_post_is_dropped(self):
+        """Комментарий к посту, удаленному до переноса, отбрасывается."""
+        post = Post.objects.create(text='Скоро удалят', author=self.author)
+        comment_queue.append(post.id, self.reader, 'Опоздал')
+        post.delete()
+        self.assertEqual(comment_queue.flush(), 0)
+        self.assertFalse(Comment.objects.exists())
@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from posts.models import AuthorStats, Comment, Follow, Post, User
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='leo')
+        cls.reader = User.objects.create(username='reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_post_and_follow_counters(self):
+        """Счетчики постов и подписок меняются вместе с данными."""
+        self.assertEqual(self.stats(CountersTest.author).post_count, 1)
+        follow = Follow.objects.create(
+            user=CountersTest.reader, author=CountersTest.author
+        )
+        self.assertEqual(self.stats(CountersTest.author).follower_count, 1)
+        self.assertEqual(self.stats(CountersTest.reader).following_count, 1)
+        follow.delete()
+        Post.objects.create(text='Второй пост', author=CountersTest.author)
+        stats = self.stats(CountersTest.author)
+        self.assertEqual(stats.follower_count, 0)
+        self.assertEqual(stats.post_count, 2)
+
+    def test_comment_counter(self):
+        """Post.comment_count следует за созданием и удалением
+        комментариев."""
+        comment = Comment.objects.create(
+            text='Комментарий',
+            post=CountersTest.post,
+            author=CountersTest.reader,
+        )
+        CountersTest.post.refresh_from_db()
+        self.assertEqual(CountersTest.post.comment_count, 1)
+        comment.delete()
+        CountersTest.post.refresh_from_db()
+        self.assertEqual(CountersTest.post.comment_count, 0)
+
+    def test_profile_reads_counter_without_count_query(self):
+        """Профайл берет число постов из счетчика, а не из COUNT(*)."""
+        AuthorStats.objects.filter(user=CountersTest.author).update(
+            post_count=42
+        )
+        response = self.guest_client.get(
+            f'/profile/{CountersTest.author.username}/'
+        )
+        self.assertContains(response, 'Всего постов: 42')
+
+    def test_missing_stats_are_recounted_on_read(self):
+        """Если строки счетчиков нет, она создается с точными значениями."""
+        AuthorStats.objects.filter(user=CountersTest.author).delete()
+        response = self.guest_client.get(
+            f'/posts/{CountersTest.post.id}/'
+        )
+        self.assertEqual(response.context['author_stats'].post_count, 1)
+
+    def test_recount_counters_repairs_drift(self):
+        """Команда recount_counters исправляет разошедшиеся счетчики."""
+        AuthorStats.objects.filter(user=CountersTest.author).update(
+            post_count=100
+        )
+        Post.objects.filter(pk=CountersTest.post.pk).update(comment_count=7)
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(self.stats(CountersTest.author).post_count, 1)
+        CountersTest.post.refresh_from_db()
+        self.assertEqual(CountersTest.post.comment_count, 0)
@@ -0,0 +1,63 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from posts.models import FeedEntry, Follow, Post, User
+
+FOLLOW_PAGE: str = '/follow/'
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='leo')
+        cls.old_post = Post.objects.create(
+            text='Пост, написанный до подписки',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(FeedTest.reader)
+
+    def test_follow_backfills_feed(self):
+        """При подписке в ленту попадают уже написанные посты автора."""
+        Follow.objects.create(user=FeedTest.reader, author=FeedTest.author)
+        response = self.reader_client.get(FOLLOW_PAGE)
+        self.assertIn(
+            FeedTest.old_post, response.context['page_obj'].object_list
+        )
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост автора сразу раскладывается в ленты подписчиков."""
+        Follow.objects.create(user=FeedTest.reader, author=FeedTest.author)
+        post = Post.objects.create(text='Свежий пост', author=FeedTest.author)
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=FeedTest.reader, post=post
+            ).exists()
+        )
+        response = self.reader_client.get(FOLLOW_PAGE)
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    def test_unfollow_prunes_feed(self):
+        """После отписки посты автора пропадают из ленты."""
+        follow = Follow.objects.create(
+            user=FeedTest.reader, author=FeedTest.author
+        )
+        follow.delete()
+        self.assertFalse(
+            FeedEntry.objects.filter(user=FeedTest.reader).exists()
+        )
+
+    def test_rebuild_feed_command(self):
+        """Команда rebuild_feed восстанавливает потерянные записи."""
+        Follow.objects.create(user=FeedTest.reader, author=FeedTest.author)
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feed', stdout=StringIO())
+        self.assertEqual(
+            FeedEntry.objects.filter(user=FeedTest.reader).count(),
+            FeedTest.author.posts.count(),
+        )
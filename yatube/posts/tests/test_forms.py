@@ -83,13 +83,12 @@ class PostCreateFormTest(TestCase):
             posts_count_after_new_post,
             posts_count_before_new_post + 1
         )
-        # Проверяем, что в БД создалась запись с заданными текстом и картинкой
-        self.assertTrue(
-            Post.objects.filter(
-                text='дополнительный sdwan тест для автотестов',
-                image='posts/test.jpg',
-            ).exists()
+        # Проверяем, что в БД создалась запись с заданными текстом и
+        # картинкой; файл картинки называется по хэшу содержимого
+        post = Post.objects.get(
+            text='дополнительный sdwan тест для автотестов'
         )
+        self.assertRegex(post.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}')
 
     def test_edit_post_form(self):
         """При отправке формы отредактированного поста
@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from posts import media, thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+IMAGE = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded_image(name):
+    return SimpleUploadedFile(name=name, content=IMAGE,
+                              content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedMediaTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='reposter')
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, image_name):
+        return Post.objects.create(text='пост', author=self.user,
+                                   image=uploaded_image(image_name))
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые картинки с разными именами хранятся одним файлом."""
+        first = self.create_post('cat.gif')
+        second = self.create_post('same_cat.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]+')
+        files = [name for _, _, names in os.walk(TEMP_MEDIA_ROOT)
+                 for name in names]
+        self.assertEqual(len(files), 1)
+
+    def age(self, name, seconds):
+        path = media.image_storage().path(name)
+        stamp = os.path.getmtime(path) - seconds
+        os.utime(path, (stamp, stamp))
+
+    def test_file_is_swept_after_last_reference(self):
+        """Файл и миниатюры удаляются очисткой после последнего поста."""
+        first = self.create_post('cat.gif')
+        second = self.create_post('cat.gif')
+        thumbnails.generate(first.image.name)
+        geometry, options = thumbnails.VARIANTS[0]
+        thumbnail = thumbnails.ready_thumbnail(first.image, geometry,
+                                               **options)
+        storage = media.image_storage()
+        self.age(first.image.name, 120)
+        first.delete()
+        self.assertEqual(media.sweep(grace=60), [])
+        self.assertTrue(storage.exists(second.image.name))
+        second.delete()
+        self.assertTrue(storage.exists(second.image.name))
+        self.assertEqual(media.sweep(grace=60), [second.image.name])
+        self.assertFalse(storage.exists(second.image.name))
+        self.assertFalse(thumbnail.exists())
+
+    def test_reused_file_is_not_swept(self):
+        """Файл, который только что загрузили заново, не удаляется,
+        даже если пост с ним еще не закоммичен.
+        """
+        post = self.create_post('cat.gif')
+        name = post.image.name
+        self.age(name, 120)
+        post.delete()
+        storage = media.image_storage()
+        storage.save('posts/cat_again.gif', uploaded_image('cat.gif'))
+        self.assertEqual(media.sweep(grace=60), [])
+        self.assertTrue(storage.exists(name))
+
+    def test_replaced_image_is_swept(self):
+        """При замене картинки прежний файл удаляет очистка."""
+        post = self.create_post('cat.gif')
+        old_name = post.image.name
+        with transaction.atomic():
+            post.image = SimpleUploadedFile('dog.gif', IMAGE + b'\x00',
+                                            content_type='image/gif')
+            post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertTrue(media.image_storage().exists(old_name))
+        self.age(old_name, 120)
+        self.assertEqual(media.sweep(grace=60), [old_name])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DedupeMediaCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_old_copies_are_merged(self):
+        """Копии из старого хранилища сливаются в один файл."""
+        user = User.objects.create(username='oldtimer')
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        names = ('posts/a.gif', 'posts/a_x1y2z3.gif')
+        for name in names:
+            with open(os.path.join(TEMP_MEDIA_ROOT, name), 'wb') as file:
+                file.write(IMAGE)
+        Post.objects.bulk_create(
+            Post(text='старый пост', author=user, image=name)
+            for name in names
+        )
+        call_command('dedupe_media', stdout=open(os.devnull, 'w'))
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        storage = media.image_storage()
+        self.assertTrue(storage.exists(images.pop()))
+        for name in names:
+            self.assertFalse(storage.exists(name))
@@ -0,0 +1,171 @@
+from django.conf import settings
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from posts.models import Group, Post, User
+
+from core.paginators import WindowedPaginator, estimate_count, page_window
+
+SLUG: str = 'sdwan'
+GROUP_LIST_PAGE: str = f'/group/{SLUG}/'
+PROFILE_PAGE: str = '/profile/adminadmin/'
+NUMBER_OF_POSTS: int = 15
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='adminadmin')
+        cls.group = Group.objects.create(
+            title='SD-WAN',
+            slug=SLUG,
+            description='Группа по обсуждению новой концепции сетей WAN'
+        )
+        # bulk_create дает всем постам почти одинаковую дату,
+        # так что порядок внутри страницы держится на id
+        Post.objects.bulk_create(
+            Post(
+                text=f'sdwan тест для автотестов номер {i}',
+                author=cls.user,
+                group=cls.group,
+            )
+            for i in range(NUMBER_OF_POSTS)
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Курсорная разбивка отдает те же посты, что и нумерованная,
+        и по ссылке «Предыдущая» возвращает на первую страницу.
+        """
+        expected = list(
+            Post.objects.filter(group=CursorPaginatorTest.group)
+            .order_by('-pub_date', '-id')
+        )
+        first = self.guest_client.get(GROUP_LIST_PAGE + '?cursor=')
+        first_page = first.context['page_obj']
+        self.assertEqual(
+            list(first_page), expected[:settings.POSTS_PER_PAGE]
+        )
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+
+        second = self.guest_client.get(
+            GROUP_LIST_PAGE + f'?cursor={first_page.next_cursor}'
+        )
+        second_page = second.context['page_obj']
+        self.assertEqual(
+            list(second_page), expected[settings.POSTS_PER_PAGE:]
+        )
+        self.assertFalse(second_page.has_next())
+
+        back = self.guest_client.get(
+            GROUP_LIST_PAGE + f'?cursor={second_page.previous_cursor}'
+        )
+        self.assertEqual(list(back.context['page_obj']), list(first_page))
+        self.assertFalse(back.context['page_obj'].has_previous())
+
+    def test_cursor_mode_skips_count_query(self):
+        """В курсорном режиме страница не считает общее число постов."""
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(GROUP_LIST_PAGE + '?cursor=')
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор открывает первую страницу, а не 500."""
+        response = self.guest_client.get(GROUP_LIST_PAGE + '?cursor=@@@')
+        self.assertEqual(
+            len(response.context['page_obj']), settings.POSTS_PER_PAGE
+        )
+
+
+class WindowedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='adminadmin')
+        # По одному, чтобы сигналы обновили счетчик постов автора
+        for i in range(NUMBER_OF_POSTS):
+            Post.objects.create(text=f'Пост номер {i}', author=cls.user)
+        cls.posts = Post.objects.order_by('-id')
+
+    def test_page_window(self):
+        """Окно: первая и последняя страницы, соседи текущей, пропуски."""
+        cases = (
+            (1, 5, [1, 2, 3, 4, 5]),
+            (1, 20, [1, 2, 3, None, 20]),
+            (4, 20, [1, 2, 3, 4, 5, 6, None, 20]),
+            (10, 20, [1, None, 8, 9, 10, 11, 12, None, 20]),
+            (20, 20, [1, None, 18, 19, 20]),
+        )
+        for number, num_pages, expected in cases:
+            with self.subTest(number=number, num_pages=num_pages):
+                self.assertEqual(
+                    list(page_window(number, num_pages)), expected
+                )
+
+    def test_understated_count_still_reaches_next_pages(self):
+        """Заниженное число строк не прячет следующие страницы."""
+        paginator = WindowedPaginator(self.posts, 10, count=3)
+        first = paginator.get_page(1)
+        self.assertTrue(first.has_next())
+        self.assertEqual(paginator.num_pages, 2)
+        second = paginator.get_page(2)
+        self.assertEqual(len(second), NUMBER_OF_POSTS - 10)
+        self.assertFalse(second.has_next())
+        self.assertEqual(paginator.count, NUMBER_OF_POSTS)
+
+    def test_overstated_count_falls_back_to_last_page(self):
+        """За концом завышенной оценки открывается последняя страница."""
+        paginator = WindowedPaginator(self.posts, 10, count=1000)
+        page = paginator.get_page(50)
+        self.assertEqual(len(page), NUMBER_OF_POSTS - 10)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(paginator.count, NUMBER_OF_POSTS)
+        self.assertFalse(paginator.estimated)
+
+    def test_rows_are_fetched_on_first_access(self):
+        """get_page() не выбирает строки, пока к ним не обратились."""
+        paginator = WindowedPaginator(self.posts, 10, count=NUMBER_OF_POSTS)
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.get_page(2)
+        self.assertEqual(len(queries), 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(page.has_next())
+            self.assertEqual(len(page), NUMBER_OF_POSTS - 10)
+        self.assertEqual(len(queries), 1)
+
+    def test_estimate_from_sqlite_stat1(self):
+        """После ANALYZE число строк берется из статистики SQLite,
+        а для queryset с фильтром оценки нет.
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest('Оценка только для SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimate_count(Post.objects.all()), NUMBER_OF_POSTS)
+        self.assertIsNone(estimate_count(Post.objects.filter(id__gt=0)))
+        paginator = WindowedPaginator(self.posts, 10, estimate=True)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(paginator.get_page(1)), 10)
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+
+    @override_settings(PAGINATOR_WINDOW=1)
+    def test_profile_uses_author_counter(self):
+        """Профайл берет число постов из счетчика автора без COUNT(*)
+        и рисует окно номеров страниц.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(PROFILE_PAGE)
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         NUMBER_OF_POSTS)
+        self.assertContains(response, '?page=2')
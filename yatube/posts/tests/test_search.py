@@ -0,0 +1,123 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from posts import search
+from posts.models import Comment, Post, User
+
+from core.stemmer import stem
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        """Разные формы слова приводятся к одной основе."""
+        cases = {
+            'кот': ('кот', 'коты', 'котов', 'котами'),
+            'программирован': ('программирование', 'программированием'),
+            'чита': ('читали', 'читать', 'читаю'),
+            'елк': ('ёлка', 'ёлки', 'Елкой'),
+        }
+        for expected, words in cases.items():
+            for word in words:
+                with self.subTest(word=word):
+                    self.assertEqual(stem(word), expected)
+
+
+class SearchTestMixin:
+    backend = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.override = override_settings(SEARCH_BACKEND=cls.backend)
+        cls.override.enable()
+        cls.user = User.objects.create(username='reader')
+        cls.cats = Post.objects.create(
+            author=cls.user,
+            text='Коты спят на подоконнике, котам тепло.'
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.user, text='Собака гуляет во дворе.'
+        )
+        cls.quiet = Post.objects.create(
+            author=cls.user, text='Тихий вечер без приключений.'
+        )
+        Comment.objects.create(author=cls.user, post=cls.quiet,
+                               text='А у меня кот гуляет по крыше.')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.override.disable()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query):
+        results = search.SearchResults(query)
+        return [post.pk for post in results[:results.count()]]
+
+    def test_finds_other_word_forms_ranked(self):
+        """Запрос находит формы слова, пост с двумя упоминаниями выше."""
+        self.assertEqual(self.found('котами'),
+                         [self.cats.pk, self.quiet.pk])
+
+    def test_all_terms_required(self):
+        """Все слова запроса должны встретиться в одном документе."""
+        self.assertEqual(self.found('кот гуляет'), [self.quiet.pk])
+        # Короткий документ с тем же словом ранжируется выше
+        self.assertEqual(self.found('гуляют'),
+                         [self.dogs.pk, self.quiet.pk])
+        self.assertEqual(self.found('кот собака'), [])
+        # Слова в посте и в комментарии к нему - разные документы
+        post = Post.objects.create(author=self.user, text='Рыжий кот.')
+        Comment.objects.create(author=self.user, post=post,
+                               text='А у нас собака.')
+        self.assertEqual(self.found('кот собака'), [])
+        self.assertEqual(self.found('рыжий кот'), [post.pk])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении."""
+        dogs = Post.objects.get(pk=self.dogs.pk)
+        dogs.text = 'Теперь здесь про попугая.'
+        dogs.save()
+        self.assertEqual(self.found('собака'), [])
+        self.assertEqual(self.found('Попугая'), [dogs.pk])
+        Comment.objects.filter(post=self.quiet).delete()
+        self.assertEqual(self.found('крыша'), [])
+        Post.objects.filter(pk=self.cats.pk).delete()
+        self.assertEqual(self.found('кот'), [])
+
+    def test_rebuild_command(self):
+        """Команда пересобирает индекс после загрузки в обход сигналов."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Черепаха ползет медленно.'),
+        ])
+        self.assertEqual(self.found('черепаха'), [])
+        call_command('rebuild_search_index', stdout=open('/dev/null', 'w'))
+        self.assertEqual(len(self.found('черепахи')), 1)
+        self.assertEqual(len(self.found('кот')), 2)
+
+    def test_search_page(self):
+        """Страница /search/ показывает найденные посты."""
+        response = self.client.get(reverse('posts:search'), {'q': 'Коты'})
+        self.assertEqual(response.context['query'], 'Коты')
+        page = response.context['page_obj']
+        self.assertEqual(page.paginator.count, 2)
+        self.assertEqual(page[0], self.cats)
+        self.assertContains(response, 'на подоконнике')
+
+
+class TableSearchTest(SearchTestMixin, TestCase):
+    backend = 'table'
+
+
+@override_settings()
+class Fts5SearchTest(SearchTestMixin, TestCase):
+    backend = 'fts5'
+
+    @classmethod
+    def setUpClass(cls):
+        if not search.fts_available():
+            cls.skipTest(cls, 'SQLite собран без FTS5')
+        super().setUpClass()
@@ -0,0 +1,143 @@
+import io
+import shutil
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts import thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+IMAGE = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded_image(name='small.gif'):
+    return SimpleUploadedFile(name=name, content=IMAGE,
+                              content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_create_generates_all_variants(self):
+        """После создания поста все миниатюры уже готовы."""
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'пост с картинкой', 'image': uploaded_image(),
+        })
+        post = Post.objects.get(text='пост с картинкой')
+        for geometry, options in thumbnails.VARIANTS:
+            with self.subTest(geometry=geometry):
+                self.assertIsNotNone(
+                    thumbnails.ready_thumbnail(post.image, geometry,
+                                               **options)
+                )
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.id,))
+        )
+        thumbnail = thumbnails.ready_thumbnail(
+            post.image, '960x339', crop='center', upscale=True
+        )
+        self.assertContains(response, thumbnail.url)
+
+    def test_pending_thumbnail_shows_placeholder(self):
+        """Пока миниатюры нет, страница показывает заглушку ее размера,
+        а не исходную картинку.
+        """
+        post = Post.objects.create(
+            text='картинка без миниатюр', author=self.user,
+            image=uploaded_image('pending.gif'),
+        )
+        self.assertIsNone(thumbnails.ready_thumbnail(
+            post.image, '1200x500', crop='center', upscale=True
+        ))
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, post.image.url)
+        self.assertContains(response, thumbnails.placeholder('1200x500'))
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_broken_pool_falls_back_to_inline(self):
+        """Если пул процессов сломан, миниатюры создаются в запросе,
+        а пул пересоздается.
+        """
+        post = Post.objects.create(
+            text='картинка при сломанном пуле', author=self.user,
+            image=uploaded_image('broken.gif'),
+        )
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool('упал процесс')
+        with mock.patch.object(thumbnails, '_executor', broken), \
+                mock.patch('django.db.transaction.on_commit',
+                           lambda func: func()), \
+                self.assertLogs(thumbnails.logger, 'ERROR'):
+            thumbnails.enqueue(post)
+            self.assertIsNone(thumbnails._executor)
+        self.assertIsNotNone(thumbnails.ready_thumbnail(
+            post.image, '1200x500', crop='center', upscale=True
+        ))
+
+    def test_ready_thumbnail_is_not_cached_as_missing(self):
+        """Миниатюра, созданная позже, сразу находится тегом."""
+        post = Post.objects.create(
+            text='миниатюра появится позже', author=self.user,
+            image=uploaded_image('later.gif'),
+        )
+        geometry, options = thumbnails.VARIANTS[0]
+        self.assertIsNone(
+            thumbnails.ready_thumbnail(post.image, geometry, **options)
+        )
+        thumbnails.generate(post.image.name)
+        self.assertIsNotNone(
+            thumbnails.ready_thumbnail(post.image, geometry, **options)
+        )
+
+    def test_prefetch(self):
+        """prefetch находит миниатюры всей страницы одним запросом к БД."""
+        posts = []
+        for i in range(3):
+            # Разные картинки: одинаковые хранились бы одним файлом
+            buffer = io.BytesIO()
+            Image.new('RGB', (4, 2), (i, 0, 0)).save(buffer, 'GIF')
+            posts.append(Post.objects.create(
+                text=f'пост {i}', author=self.user,
+                image=SimpleUploadedFile(f'page{i}.gif', buffer.getvalue()),
+            ))
+        thumbnails.generate(posts[0].image.name)
+        cache.clear()
+        images = [post.image for post in Post.objects.order_by('id')]
+        geometry, options = thumbnails.VARIANTS[0]
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(images, geometry, **options)
+        with self.assertNumQueries(0):
+            ready = [
+                thumbnails.ready_thumbnail(image, geometry, **options)
+                for image in images
+            ]
+        self.assertIsNotNone(ready[0])
+        self.assertEqual(ready[1:], [None, None])
@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from posts import search, transfer
+from posts.cache import INDEX_SCOPE, cached_count
+from posts.models import (AuthorStats, Comment, FeedEntry, Follow, Group,
+                          Post, User)
+
+OLD_DATE = datetime(2020, 5, 17, 12, 30)
+IMAGE = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='transfer', description='-'
+        )
+        for i in range(5):
+            post = Post.objects.create(
+                text=f'Пост про переезд {i}', author=cls.author,
+                group=cls.group if i % 2 else None,
+            )
+            Comment.objects.create(
+                post=post, author=cls.reader, text=f'Комментарий {i}'
+            )
+        Post.objects.update(pub_date=OLD_DATE)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'posts.ndjson')
+        call_command('export_posts', output=self.path,
+                     stderr=open(os.devnull, 'w'))
+
+    def import_posts(self, **options):
+        call_command('import_posts', self.path, batch_size=2,
+                     stdout=open(os.devnull, 'w'), **options)
+
+    def assert_imported_once(self):
+        self.assertEqual(Post.objects.count(), 10)
+        self.assertEqual(Comment.objects.count(), 10)
+        # Пользователи и группа сопоставлены с существующими
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        copies = Post.objects.order_by('id')[5:]
+        for copy in copies:
+            with self.subTest(post=copy.id):
+                self.assertEqual(copy.pub_date, OLD_DATE)
+                self.assertEqual(copy.author, self.author)
+                self.assertEqual(copy.comments.get().text,
+                                 f'Комментарий {copy.text[-1]}')
+                self.assertEqual(copy.comment_count, 1)
+
+    def test_round_trip(self):
+        """Выгрузка загружается копией с пересчетом производных данных."""
+        self.assertEqual(cached_count(INDEX_SCOPE, Post.objects.all()), 5)
+        self.import_posts()
+        self.assert_imported_once()
+        self.assertEqual(cached_count(INDEX_SCOPE, Post.objects.all()), 10)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).post_count, 10
+        )
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(),
+                         10)
+        self.assertEqual(search.SearchResults('переезды').count(), 10)
+
+    def test_resume_after_failure(self):
+        """После сбоя повторный запуск дозагружает остаток без дублей."""
+        original = transfer.Importer._import_comment
+        calls = []
+
+        def failing(importer, rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('соединение потеряно')
+            return original(importer, rows)
+
+        with mock.patch.object(transfer.Importer, '_import_comment',
+                               failing):
+            with self.assertRaises(RuntimeError):
+                self.import_posts()
+        self.assertEqual(Comment.objects.count(), 7)
+        self.import_posts()
+        self.assert_imported_once()
+
+    def test_replayed_batch_is_skipped(self):
+        """Пачка, записанная до сбоя, но не отмеченная в состоянии,
+        при повторе пропускается.
+        """
+        original = transfer.Importer._save_state
+        calls = []
+
+        def failing(importer):
+            calls.append(importer.state['line'])
+            if len(calls) == 3:
+                raise RuntimeError('диск переполнен')
+            return original(importer)
+
+        with mock.patch.object(transfer.Importer, '_save_state', failing):
+            with self.assertRaises(RuntimeError):
+                self.import_posts()
+        self.assertEqual(Post.objects.count(), 9)
+        self.import_posts()
+        self.assert_imported_once()
+
+    def test_taken_id_stops_import(self):
+        """Если во время загрузки чужой пост занял id, загрузка
+        останавливается, а не теряет пост и его комментарии.
+        """
+        original = transfer.Importer._import_post
+        calls = []
+
+        def failing(importer, rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('соединение потеряно')
+            return original(importer, rows)
+
+        with mock.patch.object(transfer.Importer, '_import_post', failing):
+            with self.assertRaises(RuntimeError):
+                self.import_posts()
+        intruder = Post.objects.create(text='Чужой пост', author=self.reader)
+        with self.assertRaises(CommandError):
+            self.import_posts()
+        self.assertEqual(Post.objects.count(), 8)
+        self.assertFalse(intruder.comments.exists())
+
+    def test_images_are_copied(self):
+        """Картинки копируются из MEDIA_ROOT источника, а без него
+        посты загружаются без картинок.
+        """
+        source = os.path.join(self.directory, 'source')
+        target = os.path.join(self.directory, 'target')
+        with override_settings(MEDIA_ROOT=source):
+            Post.objects.filter(pk=Post.objects.order_by('id')[0].pk).update(
+                image=Post._meta.get_field('image').storage.save(
+                    'posts/old.gif', SimpleUploadedFile('old.gif', IMAGE)
+                )
+            )
+        call_command('export_posts', output=self.path,
+                     stderr=open(os.devnull, 'w'))
+        with override_settings(MEDIA_ROOT=target):
+            self.import_posts(media_root=source)
+            copy = Post.objects.order_by('id')[5]
+            self.assertTrue(copy.image)
+            self.assertTrue(copy.image.storage.exists(copy.image.name))
+        os.remove(f'{self.path}.state')
+        Post.objects.filter(pk__gt=5).delete()
+        with override_settings(MEDIA_ROOT=target):
+            self.import_posts()
+        self.assertFalse(Post.objects.order_by('id')[5].image)
+
+    def test_second_import_is_refused(self):
+        """Завершенную загрузку нельзя случайно повторить."""
+        self.import_posts()
+        with self.assertRaises(Exception):
+            self.import_posts()
+        self.assertEqual(Post.objects.count(), 10)
@@ -1,9 +1,12 @@
+from http import HTTPStatus
+
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.db.models import fields
 from django.test import Client, TestCase
-from posts.models import Group, Post, User
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
 
 PAGES = [1, 2]
 SLUG_GROUP_ONE: str = 'sdwan'
@@ -267,27 +270,38 @@ class PostsPagesTest(TestCase):
                 )
 
     def test_cache_of_posts_on_home_page(self):
-        """Проверяем, что посты на главной странице
-        кэшируются на 20 секунд.
+        """Посты на главной странице кэшируются, а сохранение
+        нового поста сразу сбрасывает кэш.
         """
+        cache.clear()
         # Запрашиваю главную страницу
         # и фиксирую ее контент
         response = self.guest_client.get(HOME_PAGE)
-        cached_first_post_on_page = response.content
-        # Создаём новый пост и снова запрашиваем главную страницу
-        # проверяем, остался ли контент страницы прежним из-за кэша
+        cached_content = response.content
+        # Меняем пост в обход сигналов: версия кэша не меняется,
+        # поэтому страница должна отдаваться из кэша
+        Post.objects.filter(id=self.TOTAL_NUMBER_OF_POSTS).update(
+            text='Текст, измененный в обход сигналов'
+        )
+        response = self.guest_client.get(HOME_PAGE)
+        self.assertEqual(cached_content, response.content)
+        # Новый пост увеличивает версию кэша главной страницы,
+        # и он виден без ожидания протухания кэша
         Post.objects.create(
             text='Свежий пост для тестирования кэша',
             author=PostsPagesTest.user,
             group=PostsPagesTest.group_one
         )
         response = self.guest_client.get(HOME_PAGE)
-        self.assertEqual(cached_first_post_on_page, response.content)
-        # Чтобы не ждать 20 секунд (время протухания кэша)
-        # очищаем кэш и проверям, что контент на главной странице изменился
+        self.assertNotEqual(cached_content, response.content)
+        self.assertContains(response, 'Свежий пост для тестирования кэша')
+
+    def test_cache_key_depends_on_page_number(self):
+        """Вторая страница не отдается из кэша первой."""
         cache.clear()
-        response = self.guest_client.get(HOME_PAGE)
-        self.assertNotEqual(cached_first_post_on_page, response.content)
+        first = self.guest_client.get(HOME_PAGE)
+        second = self.guest_client.get(HOME_PAGE + '?page=2')
+        self.assertNotEqual(first.content, second.content)
 
     def test_user_can_follow_author(self):
         """Проверяем, что авторизованный пользователь
@@ -338,3 +352,141 @@ class PostsPagesTest(TestCase):
         self.assertNotIn(post, response.context['page_obj'].object_list)
         # Для завершения теста отписываем первого пользователя от второго
         self.authorized_client.get(PROFILE_UNFOLLOW_PAGE)
+
+
+class PostListQueriesTest(TestCase):
+    """Число запросов на страницу списка не зависит от числа постов."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create(username=f'author{i}') for i in range(3)
+        ]
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-'
+            )
+            for i in range(2)
+        ]
+        cls.reader = User.objects.create(username='reader')
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(settings.POSTS_PER_PAGE + 2):
+            Post.objects.create(
+                text=f'Пост номер {i}',
+                author=cls.authors[i % len(cls.authors)],
+                group=cls.groups[i % len(cls.groups)],
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(PostListQueriesTest.reader)
+
+    def test_list_pages_query_budget(self):
+        """Страницы списков укладываются в фиксированный бюджет запросов:
+        автор и группа каждого поста приходят одним JOIN-запросом.
+        """
+        group = PostListQueriesTest.groups[0]
+        author = PostListQueriesTest.authors[0]
+        budgets = {
+            # COUNT + страница
+            HOME_PAGE: 2,
+            # группа + COUNT + страница
+            f'/group/{group.slug}/': 3,
+            # автор + число постов автора (вместо COUNT) + страница
+            f'/profile/{author.username}/': 3,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    self.guest_client.get(url)
+
+    def test_follow_page_query_budget(self):
+        """Лента подписок: сессия + пользователь + COUNT + страница."""
+        with self.assertNumQueries(4):
+            self.reader_client.get(FOLLOW_PAGE)
+
+    def test_follow_and_unfollow_are_idempotent(self):
+        """Повторная подписка не создает дубль, а отписка
+        без подписки не падает с ошибкой.
+        """
+        author = PostListQueriesTest.authors[0]
+        follow_url = f'/profile/{author.username}/follow/'
+        unfollow_url = f'/profile/{author.username}/unfollow/'
+        self.reader_client.get(follow_url)
+        self.reader_client.get(follow_url)
+        self.assertEqual(
+            Follow.objects.filter(
+                user=PostListQueriesTest.reader, author=author
+            ).count(),
+            1,
+        )
+        self.reader_client.get(unfollow_url)
+        response = self.reader_client.get(unfollow_url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(
+            Follow.objects.filter(
+                user=PostListQueriesTest.reader, author=author
+            ).exists()
+        )
+
+
+class PostCommentsPaginationTest(TestCase):
+    """Комментарии к посту отдаются порциями по ключу (created, id)."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='popular')
+        cls.post = Post.objects.create(text='Вирусный пост', author=cls.author)
+        commenters = [
+            User.objects.create(username=f'commenter{i}') for i in range(5)
+        ]
+        cls.total = settings.COMMENTS_PER_PAGE * 2 + 5
+        for i in range(cls.total):
+            Comment.objects.create(
+                post=cls.post, author=commenters[i % len(commenters)],
+                text=f'Комментарий номер {i}',
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_detail_renders_first_slice(self):
+        """Страница поста показывает только первую порцию, новые сверху,
+        и число запросов не зависит от числа комментариев.
+        """
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        # пост с автором + счетчики автора + порция комментариев с авторами
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(url)
+        page = response.context['comments_page']
+        self.assertEqual(len(page.object_list), settings.COMMENTS_PER_PAGE)
+        self.assertEqual(page[0].text, f'Комментарий номер {self.total - 1}')
+        self.assertContains(response, 'comments-more')
+
+    def test_fragment_returns_following_batches(self):
+        """Фрагмент по курсору возвращает следующие порции до конца."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        page = self.guest_client.get(url).context['comments_page']
+        seen = [comment.id for comment in page]
+        fragment_url = reverse('posts:post_comments', args=(self.post.id,))
+        while page.has_next():
+            # пост + порция комментариев с авторами
+            with self.assertNumQueries(2):
+                response = self.guest_client.get(
+                    fragment_url, {'cursor': page.next_cursor}
+                )
+            page = response.context['page']
+            seen += [comment.id for comment in page]
+        self.assertEqual(len(seen), self.total)
+        self.assertEqual(len(set(seen)), self.total)
+        self.assertNotContains(response, 'comments-more')
+
+    def test_fragment_of_missing_post(self):
+        """Фрагмент комментариев несуществующего поста - 404."""
+        url = reverse('posts:post_comments', args=(self.post.id + 1000,))
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
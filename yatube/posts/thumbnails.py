@@ -0,0 +1,285 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Раньше миниатюры 1200x500 и 960x339 создавал тег {% thumbnail %}
+прямо во время рендеринга, и первый зритель поста ждал, пока Pillow
+прочитает, уменьшит и закодирует картинку. Теперь post_create и
+post_edit ставят картинку в очередь пула процессов, а шаблоны через
+тег ready_thumbnail показывают миниатюру, только если она уже готова,
+иначе - заглушку того же размера (placeholder), а не исходную
+картинку, которая может весить мегабайты.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import quote
+
+from django.conf import settings as s
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from core.queries import exempt
+
+from .media import image_storage
+
+logger = logging.getLogger(__name__)
+
+# Миниатюры, которые используют шаблоны
+VARIANTS = (
+    ('1200x500', {'crop': 'center', 'upscale': True}),
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+# Дополнительные форматы; создаются, только если их умеют
+# и Pillow, и sorl-thumbnail
+EXTRA_FORMATS = ('WEBP', 'AVIF')
+MIME_TYPES = {'WEBP': 'image/webp', 'AVIF': 'image/avif'}
+
+
+def supported_formats():
+    Image.init()
+    return tuple(
+        fmt for fmt in EXTRA_FORMATS
+        if fmt in Image.SAVE and fmt in EXTENSIONS
+    )
+
+
+class NamingBackend(ThumbnailBackend):
+    """Вычисляет миниатюру так же, как get_thumbnail(), но не создает её."""
+    def thumbnail_file(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+naming = NamingBackend()
+
+
+def _memo_key(geometry_string, options):
+    return geometry_string, tuple(sorted(options.items()))
+
+
+def ready_thumbnail(file_, geometry_string, **options):
+    """Готовая миниатюра или None, если она еще не создана.
+
+    В отличие от kvstore.get() отрицательный результат не кэшируется:
+    миниатюру создает другой процесс, и она должна появиться на
+    странице сразу после записи в хранилище. Результат, найденный
+    заранее через prefetch(), берется без обращений к кэшу и БД.
+    """
+    if not file_:
+        return None
+    memo = getattr(file_, 'ready_thumbnails', {})
+    memo_key = _memo_key(geometry_string, options)
+    if memo_key in memo:
+        return memo[memo_key]
+    thumbnail = naming.thumbnail_file(file_, geometry_string, **options)
+    key = add_prefix(thumbnail.key)
+    kv_cache = default.kvstore.cache
+    value = kv_cache.get(key)
+    if value is None or value == EMPTY_VALUE:
+        value = KVStore.objects.filter(key=key).values_list(
+            'value', flat=True
+        ).first()
+        if value is None:
+            return None
+        kv_cache.set(key, value, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+    return deserialize_image_file(value)
+
+
+def prefetch(files, geometry_string, **options):
+    """Находит готовые миниатюры сразу для всех картинок списка
+    во всех форматах: одним get_many к кэшу и одним запросом к БД
+    вместо запроса на каждую карточку. Результат запоминается на
+    самих файлах и используется ready_thumbnail().
+    """
+    targets = {}
+    for file_ in files:
+        if not file_:
+            continue
+        memo = file_.__dict__.setdefault('ready_thumbnails', {})
+        for fmt in (None,) + supported_formats():
+            variant = dict(options, format=fmt) if fmt else options
+            thumbnail = naming.thumbnail_file(
+                file_, geometry_string, **variant
+            )
+            memo_key = _memo_key(geometry_string, variant)
+            memo[memo_key] = None
+            targets.setdefault(add_prefix(thumbnail.key), []).append(
+                (memo, memo_key)
+            )
+    if not targets:
+        return
+    kv_cache = default.kvstore.cache
+    values = {
+        key: value for key, value in kv_cache.get_many(list(targets)).items()
+        if value is not None and value != EMPTY_VALUE
+    }
+    missing = [key for key in targets if key not in values]
+    if missing:
+        found = dict(KVStore.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        kv_cache.set_many(found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    for key, value in values.items():
+        thumbnail = deserialize_image_file(value)
+        for memo, memo_key in targets[key]:
+            memo[memo_key] = thumbnail
+
+
+def resolve(file_, geometry_string, **options):
+    """Миниатюра для страницы или None.
+
+    При THUMBNAIL_PREGENERATE - только готовая, иначе sorl создает ее
+    на месте. Как и {% thumbnail %}, ошибки миниатюры не ломают
+    страницу.
+    """
+    if not file_:
+        return None
+    try:
+        if s.THUMBNAIL_PREGENERATE:
+            return ready_thumbnail(file_, geometry_string, **options)
+        return get_thumbnail(file_, geometry_string, **options)
+    except Exception:
+        return None
+
+
+def placeholder(geometry_string):
+    """Заглушка на месте миниатюры, которая еще готовится: серый
+    прямоугольник ее размера в data: URI, без запроса к серверу.
+    """
+    width, _, height = geometry_string.partition('x')
+    svg = (
+        "<svg xmlns='http://www.w3.org/2000/svg' "
+        f"width='{width}' height='{height or width}'>"
+        "<rect width='100%' height='100%' fill='#e9ecef'/></svg>"
+    )
+    return 'data:image/svg+xml,' + quote(svg, safe='')
+
+
+def sources(file_, geometry_string, **options):
+    """Готовые миниатюры в дополнительных форматах для <picture>."""
+    found = []
+    for fmt in supported_formats():
+        thumbnail = resolve(file_, geometry_string, format=fmt, **options)
+        if thumbnail is not None:
+            found.append({'url': thumbnail.url, 'type': MIME_TYPES[fmt]})
+    return found
+
+
+def generate(name):
+    """Создает все варианты миниатюр для картинки name.
+
+    Возвращает ключи созданных миниатюр в хранилище sorl.
+    """
+    source = ImageFile(name, image_storage())
+    keys = []
+    for geometry, options in VARIANTS:
+        formats = (None,) + supported_formats()
+        for fmt in formats:
+            variant = dict(options, format=fmt) if fmt else options
+            thumbnail = get_thumbnail(source, geometry, **variant)
+            keys.append(thumbnail.key)
+    return keys
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=s.THUMBNAIL_WORKERS,
+                # spawn: дочерний процесс не наследует открытые
+                # соединения с БД и потоки веб-сервера
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+def _on_generated(post_id, scopes):
+    from .cache import bump
+
+    def callback(future):
+        error = future.exception()
+        if error is not None:
+            logger.error('Не удалось создать миниатюры поста %s: %s',
+                         post_id, error)
+            return
+        # Кэшированные страницы показывали заглушку,
+        # теперь их можно перерисовать с миниатюрой
+        bump(*scopes)
+    return callback
+
+
+def enqueue(post):
+    """Ставит картинку поста в очередь на подготовку миниатюр.
+
+    Пул запускается после коммита транзакции, и ответ на форму не ждет
+    Pillow. При THUMBNAIL_WORKERS = 0 миниатюры создаются сразу в
+    текущем процессе (для разработки и тестов).
+    """
+    if not post.image:
+        return
+    from django.db import transaction
+
+    from .cache import post_scope, post_scopes
+    name = post.image.name
+    scopes = (*post_scopes(post), post_scope(post.pk))
+
+    def generate_inline():
+        try:
+            with exempt():
+                generate(name)
+        except Exception as error:  # битая картинка не должна ронять запрос
+            logger.error('Не удалось создать миниатюры %s: %s', name, error)
+
+    if not s.THUMBNAIL_WORKERS:
+        generate_inline()
+        return
+
+    def submit():
+        try:
+            future = _get_executor().submit(generate, name)
+        except BrokenProcessPool as error:
+            # Пул сломан (процесс упал) - пересоздадим его к следующей
+            # картинке, а эту подготовим сами
+            logger.error('Пул миниатюр сломан: %s', error)
+            _reset_executor()
+            generate_inline()
+            return
+        future.add_done_callback(_on_generated(post.pk, scopes))
+    transaction.on_commit(submit)
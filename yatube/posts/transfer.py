@@ -0,0 +1,334 @@
+"""Перенос постов между экземплярами Yatube в формате NDJSON.
+
+Файл - это строки JSON: заголовок, затем пользователи, группы, посты,
+комментарии и подписки (именно в таком порядке, чтобы при загрузке
+все внешние ключи уже были известны). Пароли пользователей не
+переносятся.
+
+Загрузка идет пачками через bulk_create, каждая пачка - в своей
+транзакции. Пользователи и группы сопоставляются с существующими по
+username и slug. Посты и комментарии получают id = исходный id +
+смещение (максимальный id в таблице на момент первого запуска), поэтому
+ссылки комментариев на посты пересчитываются арифметикой, без словарей
+на миллионы строк. Смещения и номер последней загруженной строки
+хранятся в файле состояния: после сбоя повторный запуск продолжает с
+места остановки. Если id уже занят, загрузка останавливается с
+TransferError: при повторе пачки это та же строка и ее пропускаем, а
+чужая запись (пост, созданный во время загрузки) значит, что смещение
+больше не годится, и молча пропущенный пост увел бы свои комментарии
+к чужому.
+
+Файлы картинок в выгрузку не входят. Загрузка копирует их из
+MEDIA_ROOT исходного экземпляра (media_root); без него, как и для
+отсутствующих файлов, картинка у поста не переносится, и их число
+попадает в лог.
+"""
+import json
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max, Q
+
+from . import counters, feed, media, search
+from .cache import (INDEX_SCOPE, author_scope, bump, forget_counts,
+                    group_scope)
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FORMAT = 'yatube-posts'
+VERSION = 1
+
+
+def _date(value):
+    return value.isoformat() if value is not None else None
+
+
+def export_rows(chunk_size=2000):
+    """Строки выгрузки; таблицы читаются потоком через iterator()."""
+    yield {'type': 'header', 'format': FORMAT, 'version': VERSION}
+    tables = (
+        ('user', User.objects.values_list(
+            'id', 'username', 'first_name', 'last_name'
+        ), lambda id, username, first_name, last_name: {
+            'id': id, 'username': username,
+            'first_name': first_name, 'last_name': last_name,
+        }),
+        ('group', Group.objects.values_list(
+            'id', 'title', 'slug', 'description'
+        ), lambda id, title, slug, description: {
+            'id': id, 'title': title, 'slug': slug,
+            'description': description,
+        }),
+        ('post', Post.objects.values_list(
+            'id', 'text', 'pub_date', 'author_id', 'group_id', 'image'
+        ), lambda id, text, pub_date, author, group, image: {
+            'id': id, 'text': text, 'pub_date': _date(pub_date),
+            'author': author, 'group': group, 'image': image or '',
+        }),
+        ('comment', Comment.objects.values_list(
+            'id', 'post_id', 'author_id', 'text', 'created'
+        ), lambda id, post, author, text, created: {
+            'id': id, 'post': post, 'author': author, 'text': text,
+            'created': _date(created),
+        }),
+        ('follow', Follow.objects.values_list('user_id', 'author_id'),
+         lambda user, author: {'user': user, 'author': author}),
+    )
+    for kind, rows, to_dict in tables:
+        for row in rows.order_by('pk').iterator(chunk_size=chunk_size):
+            yield {'type': kind, **to_dict(*row)}
+
+
+@contextmanager
+def original_dates():
+    """Отключает auto_now_add, чтобы bulk_create сохранил даты из файла."""
+    fields = [Post._meta.get_field('pub_date'),
+              Comment._meta.get_field('created')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class TransferError(Exception):
+    pass
+
+
+class Importer:
+    def __init__(self, state_path, batch_size=1000, log=None,
+                 media_root=None):
+        self.state_path = state_path
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.source_media = (
+            FileSystemStorage(location=media_root) if media_root else None
+        )
+        self.state = self._load_state()
+        self.users = {}
+        self.groups = {}
+        self.missing_images = 0
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {
+                'line': 0,
+                'complete': False,
+                'offsets': {
+                    'post': self._max_id(Post),
+                    'comment': self._max_id(Comment),
+                    # id подписок задает БД; смещение нужно, чтобы
+                    # найти подписки, созданные загрузкой
+                    'follow': self._max_id(Follow),
+                },
+            }
+
+    def _save_state(self):
+        with open(self.state_path, 'w') as file:
+            json.dump(self.state, file)
+
+    @staticmethod
+    def _max_id(model):
+        return model.objects.aggregate(top=Max('id'))['top'] or 0
+
+    @property
+    def resumed(self):
+        return self.state['line'] > 0
+
+    def run(self, lines):
+        if self.state['complete']:
+            raise TransferError(
+                f'Файл уже загружен (см. {self.state_path}); удалите файл '
+                'состояния, чтобы загрузить его еще раз.'
+            )
+        self._save_state()
+        kind, batch, last_line = None, [], 0
+        with original_dates():
+            for number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                row_kind = row.pop('type')
+                if row_kind == 'header':
+                    self._check_header(row)
+                    continue
+                # Пользователи и группы сопоставляются заново при каждом
+                # запуске, остальное пропускаем до места остановки
+                if (row_kind not in ('user', 'group')
+                        and number <= self.state['line']):
+                    continue
+                if batch and (row_kind != kind
+                              or len(batch) >= self.batch_size):
+                    self._flush(kind, batch, last_line)
+                    batch = []
+                kind, last_line = row_kind, number
+                batch.append(row)
+            if batch:
+                self._flush(kind, batch, last_line)
+        self._finish()
+
+    def _check_header(self, row):
+        if row.get('format') != FORMAT or row.get('version') != VERSION:
+            raise TransferError(f'Неизвестный формат файла: {row}')
+
+    def _flush(self, kind, batch, last_line):
+        with transaction.atomic():
+            getattr(self, f'_import_{kind}')(batch)
+        if kind not in ('user', 'group'):
+            self.state['line'] = last_line
+            self._save_state()
+        self.log(f'{kind}: {len(batch)} (строка {last_line})')
+
+    def _import_user(self, rows):
+        User.objects.bulk_create(
+            (User(username=row['username'], first_name=row['first_name'],
+                  last_name=row['last_name'], password=make_password(None))
+             for row in rows),
+            ignore_conflicts=True,
+        )
+        ids = dict(User.objects.filter(
+            username__in=[row['username'] for row in rows]
+        ).values_list('username', 'id'))
+        for row in rows:
+            self.users[row['id']] = ids[row['username']]
+
+    def _import_group(self, rows):
+        Group.objects.bulk_create(
+            (Group(title=row['title'], slug=row['slug'],
+                   description=row['description']) for row in rows),
+            ignore_conflicts=True,
+        )
+        ids = dict(Group.objects.filter(
+            slug__in=[row['slug'] for row in rows]
+        ).values_list('slug', 'id'))
+        for row in rows:
+            self.groups[row['id']] = ids[row['slug']]
+
+    @staticmethod
+    def _fresh(model, objs, fields):
+        """Объекты, которых еще нет в базе. Строка с тем же id и теми
+        же fields - наша же из повторяемой пачки, с другими - чужая.
+        """
+        existing = {
+            pk: tuple(values) for pk, *values in model.objects.filter(
+                pk__in=[obj.pk for obj in objs]
+            ).values_list('pk', *fields)
+        }
+        fresh = []
+        for obj in objs:
+            if obj.pk not in existing:
+                fresh.append(obj)
+            elif existing[obj.pk] != tuple(getattr(obj, f) for f in fields):
+                raise TransferError(
+                    f'{model._meta.verbose_name} с id={obj.pk} уже есть: '
+                    'во время загрузки в базу писали, смещение id больше '
+                    'не годится.'
+                )
+        return fresh
+
+    @staticmethod
+    def _create(model, objs):
+        try:
+            model.objects.bulk_create(objs)
+        except IntegrityError as error:
+            raise TransferError(
+                f'{model._meta.verbose_name}: id заняты во время '
+                f'загрузки ({error})'
+            )
+
+    def _copy_image(self, name):
+        if not name:
+            return ''
+        if self.source_media is not None:
+            try:
+                with self.source_media.open(name) as source:
+                    return media.image_storage().save(
+                        name, File(source, name)
+                    )
+            except (FileNotFoundError, SuspiciousFileOperation):
+                pass
+        self.missing_images += 1
+        return ''
+
+    def _import_post(self, rows):
+        offset = self.state['offsets']['post']
+        posts = self._fresh(Post, [
+            Post(id=row['id'] + offset, text=row['text'],
+                 pub_date=datetime.fromisoformat(row['pub_date']),
+                 author_id=self.users[row['author']],
+                 group_id=self.groups.get(row['group']),
+                 image=row['image']) for row in rows
+        ], ('author_id', 'pub_date'))
+        # Если транзакция откатится, скопированные файлы без ссылок
+        # удалит dedupe_media
+        for post in posts:
+            post.image = self._copy_image(post.image.name)
+        self._create(Post, posts)
+
+    def _import_comment(self, rows):
+        offsets = self.state['offsets']
+        self._create(Comment, self._fresh(Comment, [
+            Comment(id=row['id'] + offsets['comment'],
+                    post_id=row['post'] + offsets['post'],
+                    author_id=self.users[row['author']], text=row['text'],
+                    created=datetime.fromisoformat(row['created']))
+            for row in rows
+        ], ('post_id', 'author_id', 'created')))
+
+    def _import_follow(self, rows):
+        Follow.objects.bulk_create(
+            (Follow(user_id=self.users[row['user']],
+                    author_id=self.users[row['author']]) for row in rows),
+            ignore_conflicts=True,
+        )
+
+    def _finish(self):
+        """Пересчитывает то, что обычно поддерживают сигналы."""
+        offsets = self.state['offsets']
+        posts = Post.objects.filter(pk__gt=offsets['post'])
+        comments = Comment.objects.filter(pk__gt=offsets['comment'])
+        # Явные id не сдвигают последовательности PostgreSQL
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [Post, Comment]):
+                cursor.execute(sql)
+        user_ids = sorted(set(self.users.values()))
+        counters.recount_comments(posts)
+        for start in range(0, len(user_ids), self.batch_size):
+            counters.recount_authors(User.objects.filter(
+                pk__in=user_ids[start:start + self.batch_size]
+            ))
+        feed.rebuild(Follow.objects.filter(
+            Q(author__posts__in=posts) | Q(pk__gt=offsets['follow'])
+        ).values('user_id'))
+        with transaction.atomic():
+            # Повторный запуск после сбоя на этом шаге не должен
+            # проиндексировать посты дважды
+            index = search.get_index()
+            index.remove_after(offsets['post'])
+            search.add_documents(posts, comments, index)
+        group_scopes = [
+            group_scope(group_id) for group_id in set(self.groups.values())
+        ]
+        forget_counts(INDEX_SCOPE, *group_scopes)
+        bump(INDEX_SCOPE, *group_scopes, *(
+            author_scope(user_id) for user_id in user_ids
+        ))
+        self.state['complete'] = True
+        self._save_state()
+        if self.missing_images:
+            self.log(f'Картинки не перенесены у постов: '
+                     f'{self.missing_images}')
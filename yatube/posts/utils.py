@@ -0,0 +1,41 @@
+from django.conf import settings as s
+
+from core.paginators import CursorPaginator, WindowedPaginator
+
+from .cache import cached_count
+from .models import Comment
+
+
+def paginate(request, post_list, count=None, scope=None):
+    """Разбивает список постов на страницы.
+
+    По умолчанию работает обычная нумерация страниц (?page=N) с окном
+    номеров вокруг текущей. count - известное заранее число постов
+    (например, из счетчика автора), scope - область кэша, где это число
+    хранится (см. posts/cache.py); и то и другое избавляет от COUNT(*).
+    Если в запросе есть параметр ?cursor=, страницы листаются по ключу
+    (pub_date, id) без подсчета общего числа постов.
+    """
+    if 'cursor' in request.GET:
+        paginator = CursorPaginator(post_list, s.POSTS_PER_PAGE)
+        return paginator.get_page(request.GET.get('cursor'))
+    if count is None and scope is not None:
+        count = cached_count(scope, post_list)
+    paginator = WindowedPaginator(post_list, s.POSTS_PER_PAGE, count=count)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def comments_page(post_id, cursor=None):
+    """Очередная порция комментариев к посту, новые сверху.
+
+    Комментарии листаются по ключу (created, id) с автором в том же
+    запросе: пост с тысячами комментариев отдается порциями по
+    COMMENTS_PER_PAGE за один запрос к БД на порцию.
+    """
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('id', 'text', 'created', 'post_id', 'author__username')
+    paginator = CursorPaginator(
+        comments, s.COMMENTS_PER_PAGE, ordering=('-created', '-id')
+    )
+    return paginator.get_page(cursor)
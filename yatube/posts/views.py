@@ -3,83 +3,138 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
 
+from core.queries import query_budget
+
+from . import comment_queue
+from .cache import (INDEX_SCOPE, author_scope, group_scope,
+                    page_cache_context, post_scope)
+from .counters import get_author_stats
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post
+from .search import SearchResults
+from .thumbnails import enqueue as enqueue_thumbnails
+from .utils import comments_page, paginate
 
 User = get_user_model()
 
 
+@query_budget(6)
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, s.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_listing()
+    page_obj = paginate(request, post_list, scope=INDEX_SCOPE)
     context = {
         'page_obj': page_obj,
+        **page_cache_context(INDEX_SCOPE, counted=True),
     }
     return render(request, template, context)
 
 
+@query_budget(6)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.group_posts.all()
-    paginator = Paginator(post_list, s.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.group_posts.for_listing()
+    page_obj = paginate(request, post_list, scope=group_scope(group.id))
 
     context = {
         'page_obj': page_obj,
         'group': group,
+        **page_cache_context(group_scope(group.id), counted=True),
     }
     return render(request, template, context)
 
 
+@query_budget(8)
 def profile(request, username):
     template = 'posts/profile.html'
     following: bool = False
     # Берем автора профайла
     author = get_object_or_404(User, username=username)
-    # Берем список подписавшихся пользователей автора,
-    subscriptions = author.following.all()
-    # Проверяем, содержат ли подписки автора
-    # пользователя, который просматривает его профайл
-    for subscription in subscriptions:
-        if subscription.user == request.user:
-            following = True
-    # Формируем вывод список постов автора с разбивкой на страницы
-    posts_list = Post.objects.filter(author=author)
-    paginator = Paginator(posts_list, s.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Проверяем одним запросом, подписан ли на автора
+    # пользователь, который просматривает его профайл
+    if request.user.is_authenticated:
+        following = author.following.filter(user=request.user).exists()
+    # Формируем вывод список постов автора с разбивкой на страницы;
+    # число постов уже есть в счетчиках автора
+    author_stats = get_author_stats(author)
+    posts_list = Post.objects.for_listing().filter(author=author)
+    page_obj = paginate(request, posts_list, author_stats.post_count)
 
     context = {
         'page_obj': page_obj,
         'author': author,
-        'following': following
+        'author_stats': author_stats,
+        'following': following,
+        **page_cache_context(author_scope(author.id)),
     }
     return render(request, template, context)
 
 
+@query_budget(6)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id
+    )
     form = CommentForm()
 
     context = {
         'post': post,
+        'author_stats': get_author_stats(post.author),
         'form': form,
+        # Первая порция комментариев; запрос выполнится, только если
+        # фрагмент со списком не найден в кэше
+        'comments_page': SimpleLazyObject(lambda: comments_page(post.id)),
+        # Свои комментарии, которые еще ждут в очереди записи
+        'pending_comments': (
+            comment_queue.pending(post.id, request.user)
+            if comment_queue.enabled() and request.user.is_authenticated
+            else ()
+        ),
+        **page_cache_context(post_scope(post.id)),
+    }
+    return render(request, template, context)
+
+
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    # Поисковый индекс сам считает число результатов и отдает посты
+    # только текущей страницы, поэтому подходит обычный Paginator
+    paginator = Paginator(SearchResults(query), s.POSTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+    }
+    return render(request, template, context)
+
+
+@query_budget(3)
+def post_comments(request, post_id):
+    """Следующая порция комментариев для подгрузки на странице поста."""
+    template = 'includes/comments.html'
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    context = {
+        'page': comments_page(post.id, request.GET.get('cursor')),
+        'post_id': post.id,
     }
     return render(request, template, context)
 
 
+@query_budget(8)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and comment_queue.enabled():
+        comment_queue.append(post.id, request.user,
+                             form.cleaned_data['text'])
+    elif form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
@@ -96,6 +151,7 @@ def post_create(request):
         form_instance_with_author = form.save(commit=False)
         form_instance_with_author.author = user
         form_instance_with_author.save()
+        enqueue_thumbnails(form_instance_with_author)
         return redirect('posts:profile', username=user.username)
     return render(request, template, {'form': form})
 
@@ -112,6 +168,7 @@ def post_edit(request, post_id):
             post.text = form.cleaned_data['text']
             post.image = form.cleaned_data['image']
             post.save()
+            enqueue_thumbnails(post)
             return redirect('posts:post_detail', post_id=post.id)
         form = PostForm(instance=post)
         is_edit: bool = True
@@ -124,23 +181,17 @@ def post_edit(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(6)
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    # Берем список подписок нашего пользователя
-    subscriptions = Follow.objects.filter(user=request.user)
-    posts_list = list()
-    # Из списка подписок берём каждую подписку
-    for subscription in subscriptions:
-        # В каждой подписке берём автора, на которого подписан пользователь
-        # у автора берем все его посты
-        # для того, чтобы список постов был итерируемым добавляем метод all()
-        for post in subscription.author.posts.all():
-            posts_list.append(post)
+    # Лента подписок материализована в FeedEntry (см. posts/feed.py),
+    # поэтому берем посты одним запросом по индексу (user, -pub_date)
+    posts_list = Post.objects.for_listing().filter(
+        feed_entries__user=request.user
+    ).order_by('-feed_entries__pub_date', '-id')
     # Добавляем разбивку на страницы
-    paginator = Paginator(posts_list, s.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, posts_list)
 
     context = {
         'page_obj': page_obj,
@@ -151,22 +202,11 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     template = 'posts/became_follow.html'
-    user = get_object_or_404(User, username=request.user.username)
     author = get_object_or_404(User, username=username)
-    # Проверяем, что пользователь еще не подписан на автора
-    if request.user.username != username:
-        user_already_subscribed = False
-        # Берем у автора все подписки  пользователей
-        subscriptions = author.following.all()
-        # Проверяем, есть ли в этих подписках наш пользователь
-        # просматривающий его профайл
-        for subscription in subscriptions:
-            if subscription.user == request.user:
-                user_already_subscribed = True
-        # Если пользователя среди текущих подписок автора не нашли,
-        # то создаем подписку
-        if not user_already_subscribed:
-            Follow.objects.create(user=user, author=author)
+    # На себя не подписываемся, повторная подписка ничего не меняет:
+    # уникальность пары (user, author) гарантирует ограничение в БД
+    if request.user != author:
+        Follow.objects.get_or_create(user=request.user, author=author)
 
     context = {
         'author': author,
@@ -177,9 +217,8 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     template = 'posts/unfollow.html'
-    user = get_object_or_404(User, username=request.user.username)
     author = get_object_or_404(User, username=username)
-    Follow.objects.get(user=user, author=author).delete()
+    Follow.objects.filter(user=request.user, author=author).delete()
     context = {
         'author': author,
     }
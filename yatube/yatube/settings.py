@@ -10,10 +10,15 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = '-z)x=$5^b98msq^p_n$y9$!gd=!kqntd_=q6-h4hmw1^*umt$1'
 
+# Профиль продакшена: YATUBE_PRODUCTION=1
+PRODUCTION = os.getenv('YATUBE_PRODUCTION', '') == '1'
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
 ALLOWED_HOSTS = ['testserver', '127.0.0.1', 'localhost', '[::1]']
+# Домены сайта через запятую; без DEBUG другие хосты Django отвергает
+ALLOWED_HOSTS += filter(None, os.getenv('YATUBE_ALLOWED_HOSTS', '').split(','))
 
 
 # Application definition
@@ -29,10 +34,13 @@ INSTALLED_APPS = [
     'about.apps.AboutConfig',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,13 +54,26 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
+# Загрузчики из core/template_loaders.py замеряют время рендера каждого
+# шаблона. В продакшене шаблоны компилируются один раз на процесс
+# и загружаются заранее при старте WSGI-приложения (TEMPLATE_WARMUP).
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if PRODUCTION:
+    TEMPLATE_LOADER = 'core.template_loaders.CachedLoader'
+else:
+    TEMPLATE_LOADER = 'core.template_loaders.Loader'
+TEMPLATE_WARMUP = PRODUCTION
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         # Добавлено: искать шаблоны на уровне проекта:
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [(TEMPLATE_LOADER, TEMPLATE_LOADERS)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -77,6 +98,45 @@ DATABASES = {
     }
 }
 
+# PRAGMA для каждого нового соединения с SQLite (см. core/db.py).
+# WAL: читатели не ждут писателя; synchronous=NORMAL с WAL не портит
+# базу при сбое; cache_size в КиБ (отрицательное значение) - на
+# соединение; busy_timeout - сколько ждать блокировку записи, прежде
+# чем вернуть «database is locked».
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+SQLITE_PRAGMAS = {}
+
+if PRODUCTION:
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+    # Соединение живет между запросами: PRAGMA и открытие файла
+    # не повторяются на каждый запрос
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.getenv('YATUBE_CONN_MAX_AGE', '600')
+    )
+
+# Реплика для чтения (см. core/routers.py): путь к копии базы, которую
+# обновляет внешняя репликация (например, litestream). Для проверки на
+# одной машине достаточно скопировать db.sqlite3 в отдельный файл.
+# После записи браузер REPLICA_PIN_SECONDS читает с основной базы.
+REPLICA_ALIAS = None
+if os.getenv('YATUBE_REPLICA_DB'):
+    REPLICA_ALIAS = 'replica'
+    DATABASES[REPLICA_ALIAS] = dict(
+        DATABASES['default'],
+        NAME=os.getenv('YATUBE_REPLICA_DB'),
+        TEST={'MIRROR': 'default'},
+    )
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_COOKIE = 'yatube_primary'
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -129,13 +189,142 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
+# Сколько номеров страниц показывать с каждой стороны от текущей
+PAGINATOR_WINDOW = 2
+# Когда числа постов главной нет в кэше, оценивать его по статистике
+# SQLite (sqlite_stat1) вместо COUNT(*) (см. posts/cache.py). Статистику
+# собирают ANALYZE или PRAGMA optimize, например по cron:
+# sqlite3 db.sqlite3 'PRAGMA optimize'
+PAGINATOR_ESTIMATE_COUNT = (
+    os.getenv('YATUBE_PAGINATOR_ESTIMATE', '') == '1'
+)
+# Сколько комментариев показывать на странице поста и подгружать за раз
+COMMENTS_PER_PAGE = 20
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Общий кэш для всех воркеров задается переменной окружения, например
+# YATUBE_CACHE_URL=redis://127.0.0.1:6379/0 (клиент Redis - свой,
+# core/cache/resp.py, без сторонних библиотек).
+# Для Redis перед общим кэшем стоит LRU в памяти процесса: его записи
+# устаревают не позже чем через YATUBE_CACHE_LOCAL_TIMEOUT секунд
+# (0 - отключить локальный уровень).
+CACHE_URL = os.getenv('YATUBE_CACHE_URL', '')
+CACHE_LOCAL_TIMEOUT = float(os.getenv('YATUBE_CACHE_LOCAL_TIMEOUT', '2'))
+
+if CACHE_URL.startswith('redis://'):
+    CACHES = {
+        'shared': {
+            'BACKEND': 'core.cache.backends.RedisCache',
+            'LOCATION': CACHE_URL,
+            'OPTIONS': {
+                'MAX_CONNECTIONS': 20,
+                'SOCKET_TIMEOUT': 1.0,
+            },
+        },
+    }
+    if CACHE_LOCAL_TIMEOUT:
+        CACHES['default'] = {
+            'BACKEND': 'core.cache.backends.TwoTierCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {
+                'LOCAL_MAX_ENTRIES': 1000,
+                'LOCAL_TIMEOUT': CACHE_LOCAL_TIMEOUT,
+            },
+        }
+    else:
+        CACHES['default'] = CACHES['shared']
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}
 
-CACHE_TIMEOUT = 20
+# Верхняя граница жизни закэшированных фрагментов страниц: сами фрагменты
+# инвалидируются точно по версии области (см. posts/cache.py)
+CACHE_TIMEOUT = 60 * 15
+# Сколько секунд может жить закэшированное число постов ленты или
+# группы, прежде чем его пересчитают точно (см. posts/cache.py)
+PAGINATOR_COUNT_MAX_AGE = 60 * 5
+
+# Лента подписок: сколько последних постов автора переносить в ленту
+# при подписке и каким размером пачек вставлять записи.
+FEED_BACKFILL_LIMIT = 1000
+FEED_BATCH_SIZE = 500
+
+# Миниатюры картинок постов готовятся заранее (см. posts/thumbnails.py).
+# YATUBE_THUMBNAIL_WORKERS - число процессов пула; 0 - создавать
+# миниатюры прямо в запросе с формой. В продакшене по умолчанию пул, в
+# разработке и тестах - 0: процессы пула не видят тестовую базу.
+THUMBNAIL_PREGENERATE = True
+THUMBNAIL_WORKERS = int(
+    os.getenv('YATUBE_THUMBNAIL_WORKERS', '2' if PRODUCTION else '0')
+)
+
+# Загрузка картинок (см. core/uploads.py): файл больше UPLOAD_IMAGE_MAX_BYTES
+# или с числом пикселей больше UPLOAD_IMAGE_MAX_PIXELS отбрасывается еще
+# при чтении запроса; принятые картинки уменьшаются до UPLOAD_IMAGE_MAX_SIDE
+# по большей стороне и сохраняются без метаданных.
+FILE_UPLOAD_HANDLERS = [
+    'core.uploads.ImageLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+UPLOAD_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+UPLOAD_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+UPLOAD_IMAGE_MAX_SIDE = 2400
+UPLOAD_IMAGE_QUALITY = 85
+
+# Полнотекстовый поиск (см. posts/search.py): 'auto' выбирает FTS5, если
+# SQLite его поддерживает, иначе инвертированный индекс в таблице
+# SearchPosting; 'fts5' и 'table' задают способ явно.
+SEARCH_BACKEND = os.getenv('YATUBE_SEARCH_BACKEND', 'auto')
+# Средняя длина документа в словах для нормализации BM25 и срок,
+# на который кэшируется число документов индекса
+SEARCH_AVERAGE_LENGTH = 40
+SEARCH_STATS_TIMEOUT = 60 * 10
+SEARCH_BATCH_SIZE = 500
+# Сколько лучших результатов поиска показывает админка постов
+SEARCH_ADMIN_LIMIT = 1000
+
+# Буферизованная запись комментариев (см. posts/comment_queue.py): путь
+# к файлу очереди SQLite; пустая строка - комментарии пишутся сразу.
+# Фоновый поток переносит очередь раз в COMMENT_QUEUE_INTERVAL секунд
+# (0 - только командой flush_comment_queue).
+COMMENT_QUEUE_PATH = os.getenv('YATUBE_COMMENT_QUEUE', '')
+COMMENT_QUEUE_INTERVAL = float(
+    os.getenv('YATUBE_COMMENT_QUEUE_INTERVAL', '1')
+)
+COMMENT_QUEUE_BATCH_SIZE = 500
+
+# Замеры производительности (см. core/middleware.py): доля запросов,
+# для которых считаются время SQL, шаблонов и кэша. Результат приходит
+# в заголовке Server-Timing и пишется в логгер yatube.performance.
+PERF_SAMPLE_RATE = float(os.getenv('YATUBE_PERF_SAMPLE_RATE', '0.01'))
+# Кэши, обращения к которым учитываются; TwoTierCache сам ходит в 'shared',
+# поэтому его подуровень отдельно не считаем
+PERF_CACHE_ALIASES = ('default',)
+# Поиск N+1 (см. core/queries.py): сколько одинаковых по форме запросов
+# за один HTTP-запрос считать проблемой и какой запрос считать медленным.
+# При QUERY_STRICT замеряется каждый запрос, а превышение бюджета вьюхи
+# или N+1 вызывает исключение; так работают тесты.
+QUERY_REPEAT_THRESHOLD = 5
+SLOW_QUERY_MS = 100
+QUERY_STRICT = False
+TEST_RUNNER = 'core.test_runner.StrictQueryRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.performance': {
+            'handlers': ['console'],
+            'level': os.getenv('YATUBE_PERF_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}